@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import generate
+
+BASELINE_PATH = os.path.join(generate.BASE_DIR, "benchmark_baseline.json")
+
+def timed(fn, repeat):
+    # -> (result of the last run, [seconds per run])
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return result, times
+
+def time_stats(times):
+    return {
+        "min_ms": round(min(times) * 1000, 3),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+    }
+
+def compressed_sizes(data, encodings):
+    sizes = {"raw": len(data)}
+    for encoding, compressed in generate.compress_variants(data, encodings).items():
+        sizes[encoding] = len(compressed)
+    return sizes
+
+def section_css(rules):
+    # Both importance halves of one section, serialized on their own
+    registry = generate.RuleRegistry(rules)
+    css, _ = generate.render_stylesheet(registry)
+    return css.encode()
+
+def available_encodings(encodings):
+    # Probe once so a missing compressor is reported once instead of on every run
+    return list(generate.compress_variants(b"probe", encodings))
+
+def run_benchmark(repeat, encodings):
+    module = generate
+    report = {"sections": {}, "steps": {}, "total": {}}
+
+    for fn in module.GENERATORS:
+        rules, times = timed(lambda: module.run_section(module, fn), repeat)
+        data = section_css(rules)
+        report["sections"][module.section_name(fn)] = {
+            "rules": len(rules) * 2,
+            **time_stats(times),
+            **compressed_sizes(data, encodings),
+        }
+
+    registry, times = timed(lambda: module.collect_rules(module)[0], repeat)
+    report["steps"]["generate"] = time_stats(times)
+    (css, _), times = timed(lambda: module.render_stylesheet(registry), repeat)
+    report["steps"]["serialize"] = time_stats(times)
+    data = css.encode()
+    for encoding in encodings:
+        _, times = timed(lambda: module.compress_variants(data, [encoding]), repeat)
+        report["steps"][f"compress_{encoding}"] = time_stats(times)
+
+    report["total"] = compressed_sizes(data, encodings)
+    return report
+
+def compare(report, baseline, size_tolerance, time_tolerance, time_slack_ms=0):
+    # -> list of regression messages; metrics missing on either side are skipped
+    regressions = []
+
+    def check(label, current, previous, key, tolerance, slack=0):
+        if previous.get(key) is None or current.get(key) is None or tolerance is None:
+            return
+        limit = previous[key] * (1 + tolerance) + slack
+        if current[key] > limit:
+            regressions.append(f"{label} {key}: {current[key]} > {previous[key]} (+{tolerance:.0%} allowed)")
+
+    size_keys = ["raw"] + list(generate.COMPRESSORS)
+    for name, current in report["sections"].items():
+        previous = baseline.get("sections", {}).get(name)
+        if previous is None:
+            continue
+        for key in size_keys:
+            check(f"section {name}", current, previous, key, size_tolerance)
+        check(f"section {name}", current, previous, "min_ms", time_tolerance, time_slack_ms)
+    for name, current in report["steps"].items():
+        previous = baseline.get("steps", {}).get(name)
+        if previous is not None:
+            check(f"step {name}", current, previous, "min_ms", time_tolerance, time_slack_ms)
+    for key in size_keys:
+        check("total", report["total"], baseline.get("total", {}), key, size_tolerance)
+    return regressions
+
+def print_report(report, encodings):
+    columns = ["rules", "min_ms", "raw"] + encodings
+    print(f"{'section':<22}" + "".join(f"{column:>10}" for column in columns))
+    for name, row in report["sections"].items():
+        print(f"{name:<22}" + "".join(f"{row.get(column, '-'):>10}" for column in columns))
+    print(f"{'total':<22}{'':>10}{'':>10}" + "".join(f"{report['total'].get(column, '-'):>10}" for column in ["raw"] + encodings))
+    for name, row in report["steps"].items():
+        print(f"step {name:<17}{row['min_ms']:>10} ms (median {row['median_ms']} ms)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each generator and measure the bytes it contributes.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (default: 5)")
+    parser.add_argument("--compress", type=generate.encoding_list, default=list(generate.COMPRESSORS), help="Encodings to measure (default: br,gz,zst)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--size-tolerance", type=float, default=0.01, help="Allowed relative growth in bytes (default: 0.01)")
+    parser.add_argument("--time-tolerance", type=float, default=1.0, help="Allowed relative slowdown of min times (default: 1.0, timings are noisy)")
+    parser.add_argument("--time-slack-ms", type=float, default=1.0, help="Absolute slowdown always allowed, so sub-millisecond sections do not flap (default: 1.0)")
+    parser.add_argument("--no-time-check", action="store_true", help="Only compare sizes")
+    parser.add_argument("--update", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    encodings = available_encodings(args.compress)
+    report = run_benchmark(args.repeat, encodings)
+    print_report(report, encodings)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Updated baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    time_tolerance = None if args.no_time_check else args.time_tolerance
+    regressions = compare(report, baseline, args.size_tolerance, time_tolerance, args.time_slack_ms)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        return 1
+    print("No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,63 @@
+import argparse
+import fnmatch
+import glob
+import gzip
+import hashlib
+import heapq
+import importlib.util
+import itertools
+import json
 import os
-# import rcssmin
+import queue
+import re
+import string
+import subprocess
+import sys
+import threading
+import time
+import types
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+# Optional in-process compressors, the external binaries are the last resort
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Optional exact token counts for the style guide
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_CSS_PATH = os.path.join(BASE_DIR, "../../static/css/generated.css")
 OUTPUT_DOCS_PATH = os.path.join(BASE_DIR, "../../static/css/style-guide.md")
+OUTPUT_INDEX_PATH = os.path.join(BASE_DIR, "../../static/css/class-index.json")
+OUTPUT_CLASS_MAP_PATH = os.path.join(BASE_DIR, "../../static/css/class-map.json")
+OUTPUT_STATS_PATH = os.path.join(BASE_DIR, "../../static/css/build-stats.json")
+OUTPUT_USAGE_REPORT_PATH = os.path.join(BASE_DIR, "../../static/css/usage-report.json")
+OUTPUT_USAGE_INDEX_PATH = os.path.join(BASE_DIR, ".class-usage.json")
+MANIFEST_NAME = "manifest.json"
+CONTENT_HASH_LENGTH = 10
 
 # Utility Patterns
 SPACING_DIRECTIONS = {
@@ -33,6 +86,17 @@ COLORS = [
     "light", "dark", "white", "black", "muted", "body", "surface"
 ]
 
+# Border radius: class suffix -> value ("" is plain `.rounded`)
+RADIUS_SCALE = {
+    "": "var(--radius-md)",
+    "0": "0",
+    "circle": "50%",
+    "pill": "50rem",
+    "sm": "var(--radius-sm)",
+    "lg": "var(--radius-lg)",
+    "xl": "var(--radius-xl)",
+}
+
 displays = ["none", "inline", "inline-block", "block", "grid", "table", "flex", "inline-flex"]
 positions = ["static", "relative", "absolute", "fixed", "sticky"]
 flex_directions = ["row", "row-reverse", "column", "column-reverse"]
@@ -42,20 +106,322 @@ align_items = ["start", "end", "center", "baseline", "stretch"]
 align_contents = ["start", "end", "center", "space-between", "space-around", "stretch"]
 align_selfs = ["auto", "start", "end", "center", "baseline", "stretch"]
 
-css_rules = []
+# Pixel families (`.pt-37px`, `.w-240px`): class prefix -> properties
+def spacing_px_patterns():
+    patterns = {}
+    for code, props in SPACING_DIRECTIONS.items():
+        patterns[f"p{code}"] = [p for p in props if p.startswith("padding")]
+        patterns[f"m{code}"] = [p for p in props if p.startswith("margin")]
+    return patterns
+
+SPACING_PX_PATTERNS = spacing_px_patterns()
 
-def add_rule(selector, properties, is_important=False):
-    suffix = "-imp" if is_important else ""
-    imp_str = " !important" if is_important else ""
-    
-    props_str = ""
-    for prop, val in properties.items():
-        props_str += f"{prop}: {val}{imp_str};"
-    
-    css_rules.append(f"{selector}{suffix} {{{props_str}}}")
+SIZING_PX_PATTERNS = {
+    "w": ["width"],
+    "h": ["height"],
+}
+
+PX_PATTERNS = {**SPACING_PX_PATTERNS, **SIZING_PX_PATTERNS}
+PX_CLASS_RE = re.compile(r"([a-z]+)-(0|[1-9][0-9]*)px(-imp)?")
+
+# Pixel values enumerated by default; --content replaces this with the values actually used
+PX_RANGE = range(1, 101)
+px_values = PX_RANGE
+
+# Variants (`md:p-3`, `hover:bg-primary`, `md:hover:p-3-imp`), only generated when requested
+BREAKPOINTS = {
+    "sm": "576px",
+    "md": "768px",
+    "lg": "992px",
+    "xl": "1200px",
+}
+STATES = {
+    "hover": ":hover",
+    "focus": ":focus",
+    "active": ":active",
+}
+
+# `-imp` classes: None emits one for every utility, otherwise only for class names starting
+# with one of these prefixes ([] for none)
+IMPORTANT_PREFIXES = None
+# Cascade layer the normal utilities are wrapped in, so unlayered CSS overrides them
+# without !important (None to leave them unlayered)
+CASCADE_LAYER = None
+IMPORTANT_STRATEGIES = ["all", "allow", "layer", "none"]
+# Reorder rules within cascade-safe limits so similar rules sit next to each other
+COMPRESSION_ORDER = False
+
+# class="..." / className="..." attribute values, for rewriting templates
+CLASS_ATTR_RE = re.compile(r"""(\bclass(?:Name)?\s*=\s*)(["'])(.*?)\2""", re.S)
+
+# Anything that could be a class name inside a template, JSX file or string literal
+CLASS_TOKEN_RE = re.compile(r"[\w:-]+")
+
+# Rule IR: generators run once, the normal and -imp halves are both rendered from it
+class Rule:
+    __slots__ = ("selector", "declarations", "section")
+
+    def __init__(self, selector, properties, section=None):
+        self.selector = selector
+        # Property names repeat thousands of times, interning makes them share one string
+        self.declarations = tuple((sys.intern(prop), value) for prop, value in properties.items())
+        self.section = section
+
+    def class_name(self, is_important=False):
+        return self.selector[1:] + ("-imp" if is_important else "")
+
+    def __repr__(self):
+        return f"Rule({self.selector!r}, {dict(self.declarations)!r}, section={self.section!r})"
+
+class RuleRegistry:
+    # Selector -> Rule, insertion order is cascade order
+    def __init__(self, rules=()):
+        self.rules = {}
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule):
+        if rule.selector in self.rules:
+            raise ValueError(f"Duplicate utility selector {rule.selector}")
+        self.rules[rule.selector] = rule
+
+    def get(self, selector):
+        return self.rules.get(selector)
+
+    def __contains__(self, selector):
+        return selector in self.rules
+
+    def __iter__(self):
+        return iter(self.rules.values())
+
+    def __len__(self):
+        return len(self.rules)
+
+# List the running generator appends to, see run_section()
+rule_sink = None
+
+def add_rule(selector, properties):
+    rule_sink.append(Rule(selector, properties))
+
+class RuleGroup:
+    # One output rule: every selector that shares a declaration block
+    __slots__ = ("selectors", "declarations", "is_important")
+
+    def __init__(self, selectors, declarations, is_important):
+        self.selectors = selectors
+        self.declarations = declarations
+        self.is_important = is_important
+
+# Shorthands and longhands that can override each other share a family
+PROPERTY_FAMILY_ALIASES = {
+    "top": "inset", "bottom": "inset", "left": "inset", "right": "inset",
+    "place": "align", "justify": "align",
+}
+# Prefixes whose properties are independent of each other (max-width vs max-height)
+PROPERTY_FAMILY_TWO_PARTS = {"min", "max", "text"}
+
+def property_family(prop):
+    if prop.startswith("-"):
+        # Vendor prefix: -webkit-line-clamp -> line-clamp
+        prop = prop.split("-", 2)[2]
+    parts = prop.split("-")
+    if parts[0] in PROPERTY_FAMILY_TWO_PARTS:
+        return "-".join(parts[:2])
+    return PROPERTY_FAMILY_ALIASES.get(parts[0], parts[0])
+
+def class_selector(name, pseudo="", rename=None):
+    # rename maps template class names to their mangled tokens
+    if rename is not None:
+        name = rename[name]
+    return "." + name.replace(":", "\\:") + pseudo
+
+def merge_duplicate_bodies(entries, rename=None):
+    # A rule only joins an earlier group with the same body if nothing in between
+    # touched any of its property families, so the cascade is unchanged
+    groups = []
+    group_by_body = {}
+    last_group_by_family = {}
+    for name, pseudo, rule, is_important in entries:
+        selector = class_selector(name, pseudo, rename)
+        body = (rule.declarations, is_important)
+        families = {property_family(prop) for prop, _ in rule.declarations}
+        index = group_by_body.get(body)
+        if index is None or any(last_group_by_family[family] != index for family in families):
+            index = group_by_body[body] = len(groups)
+            groups.append(RuleGroup([], rule.declarations, is_important))
+            for family in families:
+                last_group_by_family[family] = index
+        groups[index].selectors.append(selector)
+    return groups
+
+# Minified serializer
+NUMBER_RE = re.compile(r"(?<![\w.#-])(-?)(\d*\.?\d+)([a-z%]*)")
+SEPARATOR_RE = re.compile(r"\s*([,/])\s*")
+# Units a zero length can drop (never time or angle units)
+ZERO_DROP_UNITS = {"px", "rem", "em", "ch", "vw", "vh", "%"}
+
+def minify_number(match):
+    sign, number, unit = match.groups()
+    if "." in number:
+        # 0.0rem -> 0rem, 1.50 -> 1.5, 0.25 -> .25
+        number = number.rstrip("0").rstrip(".")
+        if number.startswith("0."):
+            number = number[1:]
+        if not number:
+            number = "0"
+    if number == "0":
+        sign = ""
+        if unit in ZERO_DROP_UNITS:
+            unit = ""
+    return sign + number + unit
+
+@lru_cache(maxsize=None)
+def normalize_value(value):
+    value = NUMBER_RE.sub(minify_number, value)
+    return SEPARATOR_RE.sub(r"\1", value)
+
+def serialize_blocks(blocks):
+    for media, groups in blocks:
+        if media is None:
+            yield from serialize(groups)
+        else:
+            yield f"@media (min-width:{media}){{"
+            yield from serialize(groups)
+            yield "}"
+
+def serialize(groups):
+    # Yields each rule fully minified, so callers join (or write) exactly once
+    for group in groups:
+        imp_str = "!important" if group.is_important else ""
+        body = ";".join(f"{prop}:{normalize_value(val)}{imp_str}" for prop, val in group.declarations)
+        yield f"{','.join(group.selectors)}{{{body}}}"
+
+def important_allowed(name):
+    # name is the class without its -imp suffix
+    return IMPORTANT_PREFIXES is None or name.startswith(tuple(IMPORTANT_PREFIXES))
+
+def output_entries(registry, used=None):
+    # (class name, pseudo-class, rule, is_important) in stylesheet order: every normal
+    # rule, then the -imp half
+    entries = []
+    for is_important in (False, True):
+        for rule in registry:
+            if is_important and not important_allowed(rule.class_name()):
+                continue
+            if used is None or rule.class_name(is_important) in used:
+                entries.append((rule.class_name(is_important), "", rule, is_important))
+    return entries
+
+def parse_variant(token):
+    # `md:hover:p-3` -> ("md", "hover", "p-3"), breakpoint before state; None if not a variant
+    *prefixes, name = token.split(":")
+    if not prefixes or not name:
+        return None
+    breakpoint = state = None
+    for prefix in prefixes:
+        if prefix in BREAKPOINTS and breakpoint is None and state is None:
+            breakpoint = prefix
+        elif prefix in STATES and state is None:
+            state = prefix
+        else:
+            return None
+    return breakpoint, state, name
+
+def px_block_positions(registry):
+    # Pixel prefix -> (index of the last rule of its pixel block, position in its pattern
+    # table, section): where a value the registry does not enumerate sorts
+    last = {}
+    for index, rule in enumerate(registry):
+        match = PX_CLASS_RE.fullmatch(rule.class_name())
+        if match and match.group(1) in PX_PATTERNS:
+            last[match.group(1)] = (index, rule.section)
+    positions = {}
+    for patterns in (SPACING_PX_PATTERNS, SIZING_PX_PATTERNS):
+        ends = [last[prefix] for prefix in patterns if prefix in last]
+        if ends:
+            index, section = max(ends)
+            for order, prefix in enumerate(patterns):
+                positions[prefix] = (index, order, section)
+    return positions
+
+def variant_entries(registry, tokens):
+    # -> {breakpoint or None: entries}, each list in the same cascade order as the base rules
+    order = {rule.selector: index for index, rule in enumerate(registry)}
+    px_positions = None
+    found = {}
+    for token in tokens:
+        parsed = parse_variant(token)
+        if parsed is None:
+            continue
+        breakpoint, state, name = parsed
+        is_important = name.endswith("-imp")
+        base = name[:-len("-imp")] if is_important else name
+        if is_important and not important_allowed(base):
+            continue
+        rule = registry.get("." + base)
+        if rule is not None:
+            position = (order[rule.selector], 0, 0)
+        else:
+            # Pixel values the base rules do not enumerate (`md:pt-150px`) are resolved for
+            # the variant only, after their pixel block by value and then prefix
+            resolved = resolve_px_class(base)
+            if resolved is None:
+                continue
+            if px_positions is None:
+                px_positions = px_block_positions(registry)
+            prefix, px = PX_CLASS_RE.fullmatch(base).group(1, 2)
+            if prefix not in px_positions:
+                continue
+            index, prefix_order, section = px_positions[prefix]
+            rule = Rule("." + base, resolved[0], section)
+            position = (index, int(px), prefix_order)
+        pseudo = STATES[state] if state else ""
+        found.setdefault(breakpoint, []).append((is_important, position, token, pseudo, rule))
+    return {
+        breakpoint: [(token, pseudo, rule, is_important) for is_important, _, token, pseudo, rule in sorted(items)]
+        for breakpoint, items in found.items()
+    }
+
+def stylesheet_blocks(registry, used=None, variants=()):
+    # [(media min-width or None, entries)]: base rules, state variants, then one @media block
+    # per breakpoint in ascending order, so every rule sharing a breakpoint shares its block
+    blocks = [(None, output_entries(registry, used))]
+    by_breakpoint = variant_entries(registry, set(variants) | (used or set()))
+    blocks[0][1].extend(by_breakpoint.pop(None, []))
+    for breakpoint, width in BREAKPOINTS.items():
+        if breakpoint in by_breakpoint:
+            blocks.append((width, by_breakpoint[breakpoint]))
+    return blocks
+
+def stylesheet_class_names(registry, used=None, variants=()):
+    return [entry[0] for _, entries in stylesheet_blocks(registry, used, variants) for entry in entries]
+
+def add_px_rule(prefix, px):
+    value = f"{px}px"
+    add_rule(f".{prefix}-{px}px", {p: value for p in PX_PATTERNS[prefix]})
+
+def resolve_px_class(name):
+    # `pt-37px-imp` -> ({"padding-top": "37px"}, True), None for anything else
+    match = PX_CLASS_RE.fullmatch(name)
+    if not match:
+        return None
+    props = PX_PATTERNS.get(match.group(1))
+    if props is None:
+        return None
+    value = f"{match.group(2)}px"
+    return {p: value for p in props}, bool(match.group(3))
+
+def requested_px_values(tokens):
+    values = set()
+    for token in tokens:
+        # Variants resolve their base class too: `md:pt-37px` -> 37
+        match = PX_CLASS_RE.fullmatch(token.rsplit(":", 1)[-1])
+        if match and match.group(1) in PX_PATTERNS:
+            values.add(int(match.group(2)))
+    return sorted(values)
 
 # Generator Functions
-def generate_spacing(is_important):
+def generate_spacing():
     # Levels 0-6
     for level, value in SPACING_LEVELS.items():
         for code, props in SPACING_DIRECTIONS.items():
@@ -65,7 +431,7 @@ def generate_spacing(is_important):
             if p_list:
                 for p in p_list: p_props[p] = value
                 selector = f".p{code}-{level}"
-                add_rule(selector, p_props, is_important)
+                add_rule(selector, p_props)
             
             # Margin
             m_props = {}
@@ -73,27 +439,12 @@ def generate_spacing(is_important):
             if m_list:
                 for p in m_list: m_props[p] = value
                 selector = f".m{code}-{level}"
-                add_rule(selector, m_props, is_important)
+                add_rule(selector, m_props)
 
-    # Pixels 1-100
-    for px in range(1, 101):
-        value = f"{px}px"
-        for code, props in SPACING_DIRECTIONS.items():
-            # Padding
-            p_props = {}
-            p_list = [p for p in props if p.startswith("padding")]
-            if p_list:
-                for p in p_list: p_props[p] = value
-                selector = f".p{code}-{px}px"
-                add_rule(selector, p_props, is_important)
-            
-            # Margin
-            m_props = {}
-            m_list = [p for p in props if p.startswith("margin")]
-            if m_list:
-                for p in m_list: m_props[p] = value
-                selector = f".m{code}-{px}px"
-                add_rule(selector, m_props, is_important)
+    # Pixels (1-100 by default, on demand in --content mode)
+    for px in px_values:
+        for prefix in SPACING_PX_PATTERNS:
+            add_px_rule(prefix, px)
     
     # Auto margins
     for code, props in SPACING_DIRECTIONS.items():
@@ -102,86 +453,86 @@ def generate_spacing(is_important):
         if m_list:
             for p in m_list: m_props[p] = "auto"
             selector = f".m{code}-auto"
-            add_rule(selector, m_props, is_important)
+            add_rule(selector, m_props)
 
-def generate_display(is_important):
+def generate_display():
     for d in displays:
-        add_rule(f".d-{d}", {"display": d}, is_important)
+        add_rule(f".d-{d}", {"display": d})
 
-def generate_position(is_important):
+def generate_position():
     for p in positions:
-        add_rule(f".position-{p}", {"position": p}, is_important)
+        add_rule(f".position-{p}", {"position": p})
     
     for side in ["top", "bottom", "left", "right"]:
         for val in [0, 50, 100]:
-            add_rule(f".{side}-{val}", {side: f"{val}%"}, is_important)
+            add_rule(f".{side}-{val}", {side: f"{val}%"})
 
-def generate_flex(is_important):
+def generate_flex():
     for d in flex_directions:
-        add_rule(f".flex-{d}", {"flex-direction": d}, is_important)
+        add_rule(f".flex-{d}", {"flex-direction": d})
     for w in flex_wraps:
-        add_rule(f".flex-{w}", {"flex-wrap": w}, is_important)
+        add_rule(f".flex-{w}", {"flex-wrap": w})
     
     # Justify Content
     for j in justify_contents:
         val = j
         if j in ["start", "end"]: val = f"flex-{j}"
-        add_rule(f".justify-content-{j}", {"justify-content": val}, is_important)
+        add_rule(f".justify-content-{j}", {"justify-content": val})
     
     # Align Items
     for a in align_items:
         val = a
         if a in ["start", "end"]: val = f"flex-{a}"
-        add_rule(f".align-items-{a}", {"align-items": val}, is_important)
+        add_rule(f".align-items-{a}", {"align-items": val})
         
     # Align Content
     for a in align_contents:
         val = a
         if a in ["start", "end"]: val = f"flex-{a}"
-        add_rule(f".align-content-{a}", {"align-content": val}, is_important)
+        add_rule(f".align-content-{a}", {"align-content": val})
         
     # Align Self
     for a in align_selfs:
         val = a
         if a in ["start", "end"]: val = f"flex-{a}"
-        add_rule(f".align-self-{a}", {"align-self": val}, is_important)
+        add_rule(f".align-self-{a}", {"align-self": val})
 
     # Grow/Shrink
     for i in [0, 1]:
-        add_rule(f".flex-grow-{i}", {"flex-grow": str(i)}, is_important)
-        add_rule(f".flex-shrink-{i}", {"flex-shrink": str(i)}, is_important)
+        add_rule(f".flex-grow-{i}", {"flex-grow": str(i)})
+        add_rule(f".flex-shrink-{i}", {"flex-shrink": str(i)})
     
-    add_rule(".flex-fill", {"flex": "1 1 auto"}, is_important)
+    add_rule(".flex-fill", {"flex": "1 1 auto"})
     
     # Gap 0-10 (0.25rem steps)
     for i in range(11):
-        add_rule(f".gap-{i}", {"gap": f"{i*0.25}rem"}, is_important)
+        add_rule(f".gap-{i}", {"gap": f"{i*0.25}rem"})
 
-def generate_typography(is_important):
+def generate_typography():
     # Align
     for a in ["start", "end", "center", "justify"]:
-        add_rule(f".text-{a}", {"text-align": a}, is_important)
+        add_rule(f".text-{a}", {"text-align": a})
     
     # Transform
     for t in ["lowercase", "uppercase", "capitalize"]:
-        add_rule(f".text-{t}", {"text-transform": t}, is_important)
+        add_rule(f".text-{t}", {"text-transform": t})
         
     # Decoration
     for d in ["none", "underline", "line-through"]:
-        add_rule(f".text-decoration-{d}", {"text-decoration": d}, is_important)
+        add_rule(f".text-decoration-{d}", {"text-decoration": d})
         
     # Wrap
     for w in ["wrap", "nowrap", "break"]:
         val = "normal"
         if w == "nowrap": val = "nowrap"
         if w == "break": val = "break-word" # simplistic
-        add_rule(f".text-{w}", {"white-space": val}, is_important)
+        add_rule(f".text-{w}", {"white-space": val})
         
     # Weight
     for w in ["light", "lighter", "normal", "bold", "bolder"]:
-        add_rule(f".fw-{w}", {"font-weight": w}, is_important)
+        add_rule(f".fw-{w}", {"font-weight": w})
     for w in range(100, 1000, 100):
-        add_rule(f".fw-{w}", {"font-weight": str(w)}, is_important)
+        add_rule(f".fw-{w}", {"font-weight": str(w)})
         
     # Size 1-6 (headings) and fs-1 to fs-6 where fs-1 is biggest
     # Bootstrap logic: fs-1: 2.5rem, fs-2: 2rem, fs-3: 1.75rem, fs-4: 1.5rem, fs-5: 1.25rem, fs-6: 1rem
@@ -189,92 +540,88 @@ def generate_typography(is_important):
         1: "2.5rem", 2: "2rem", 3: "1.75rem", 4: "1.5rem", 5: "1.25rem", 6: "1rem"
     }
     for level, size in sizes.items():
-        add_rule(f".fs-{level}", {"font-size": size}, is_important)
+        add_rule(f".fs-{level}", {"font-size": size})
         
     # Colors
     for c in COLORS:
-        add_rule(f".text-{c}", {"color": f"var(--color-{c})"}, is_important)
-        add_rule(f".bg-{c}", {"background-color": f"var(--color-{c})"}, is_important)
+        add_rule(f".text-{c}", {"color": f"var(--color-{c})"})
+        add_rule(f".bg-{c}", {"background-color": f"var(--color-{c})"})
 
-def generate_sizing(is_important):
+def generate_sizing():
     # Width/Height %
     for i in [25, 50, 75, 100, "auto"]:
         val = "auto" if i == "auto" else f"{i}%"
-        add_rule(f".w-{i}", {"width": val}, is_important)
-        add_rule(f".h-{i}", {"height": val}, is_important)
+        add_rule(f".w-{i}", {"width": val})
+        add_rule(f".h-{i}", {"height": val})
         
-    add_rule(".mw-100", {"max-width": "100%"}, is_important)
-    add_rule(".mh-100", {"max-height": "100%"}, is_important)
-    add_rule(".vw-100", {"width": "100vw"}, is_important)
-    add_rule(".vh-100", {"height": "100vh"}, is_important)
+    add_rule(".mw-100", {"max-width": "100%"})
+    add_rule(".mh-100", {"max-height": "100%"})
+    add_rule(".vw-100", {"width": "100vw"})
+    add_rule(".vh-100", {"height": "100vh"})
     
-    # Width/Height px (1-100)
-    for px in range(1, 101):
-        add_rule(f".w-{px}px", {"width": f"{px}px"}, is_important)
-        add_rule(f".h-{px}px", {"height": f"{px}px"}, is_important)
+    # Width/Height px (1-100 by default, on demand in --content mode)
+    for px in px_values:
+        for prefix in SIZING_PX_PATTERNS:
+            add_px_rule(prefix, px)
 
-def generate_borders(is_important):
-    add_rule(".border", {"border": "1px solid var(--border-default)"}, is_important)
+def generate_borders():
+    add_rule(".border", {"border": "1px solid var(--border-default)"})
     for side in ["top", "bottom", "left", "right"]:
-        add_rule(f".border-{side}", {f"border-{side}": "1px solid var(--border-default)"}, is_important)
+        add_rule(f".border-{side}", {f"border-{side}": "1px solid var(--border-default)"})
     
-    add_rule(".border-0", {"border": "0"}, is_important)
+    add_rule(".border-0", {"border": "0"})
     for side in ["top", "bottom", "left", "right"]:
-        add_rule(f".border-{side}-0", {f"border-{side}": "0"}, is_important)
+        add_rule(f".border-{side}-0", {f"border-{side}": "0"})
         
     for c in COLORS:
-        add_rule(f".border-{c}", {"border-color": f"var(--color-{c})"}, is_important)
+        add_rule(f".border-{c}", {"border-color": f"var(--color-{c})"})
         
     # Radius
-    add_rule(".rounded", {"border-radius": "var(--radius-md)"}, is_important)
-    add_rule(".rounded-0", {"border-radius": "0"}, is_important)
-    add_rule(".rounded-circle", {"border-radius": "50%"}, is_important)
-    add_rule(".rounded-pill", {"border-radius": "50rem"}, is_important)
-    add_rule(".rounded-sm", {"border-radius": "var(--radius-sm)"}, is_important)
-    add_rule(".rounded-lg", {"border-radius": "var(--radius-lg)"}, is_important)
-    add_rule(".rounded-xl", {"border-radius": "var(--radius-xl)"}, is_important)
-
-def generate_effects(is_important):
+    for name, value in RADIUS_SCALE.items():
+        selector = f".rounded-{name}" if name else ".rounded"
+        add_rule(selector, {"border-radius": value})
+
+def generate_effects():
     # Opacity
     for i in range(0, 101, 5): # 0, 5, 10... 100
-        add_rule(f".opacity-{i}", {"opacity": str(i/100)}, is_important)
+        add_rule(f".opacity-{i}", {"opacity": str(i/100)})
 
     # Cursor
     for c in ["auto", "default", "pointer", "text", "wait", "move", "not-allowed"]:
-        add_rule(f".cursor-{c}", {"cursor": c}, is_important)
+        add_rule(f".cursor-{c}", {"cursor": c})
 
     # Visibility
-    add_rule(".visible", {"visibility": "visible"}, is_important)
-    add_rule(".invisible", {"visibility": "hidden"}, is_important)
+    add_rule(".visible", {"visibility": "visible"})
+    add_rule(".invisible", {"visibility": "hidden"})
 
-def generate_overflow(is_important):
+def generate_overflow():
     for val in ["hidden", "scroll", "auto", "visible"]:
-        add_rule(f".overflow-{val}", {"overflow": val}, is_important)
-    add_rule(".overflow-x-auto", {"overflow-x": "auto"}, is_important)
-    add_rule(".overflow-y-auto", {"overflow-y": "auto"}, is_important)
-    add_rule(".overflow-x-hidden", {"overflow-x": "hidden"}, is_important)
-    add_rule(".overflow-y-hidden", {"overflow-y": "hidden"}, is_important)
-    add_rule(".overflow-x-scroll", {"overflow-x": "scroll"}, is_important)
-    add_rule(".overflow-y-scroll", {"overflow-y": "scroll"}, is_important)
-
-def generate_zindex(is_important):
+        add_rule(f".overflow-{val}", {"overflow": val})
+    add_rule(".overflow-x-auto", {"overflow-x": "auto"})
+    add_rule(".overflow-y-auto", {"overflow-y": "auto"})
+    add_rule(".overflow-x-hidden", {"overflow-x": "hidden"})
+    add_rule(".overflow-y-hidden", {"overflow-y": "hidden"})
+    add_rule(".overflow-x-scroll", {"overflow-x": "scroll"})
+    add_rule(".overflow-y-scroll", {"overflow-y": "scroll"})
+
+def generate_zindex():
     for z in [0, 10, 20, 30, 40, 50]:
-        add_rule(f".z-{z}", {"z-index": str(z)}, is_important)
-    add_rule(".z-auto", {"z-index": "auto"}, is_important)
+        add_rule(f".z-{z}", {"z-index": str(z)})
+    add_rule(".z-auto", {"z-index": "auto"})
     # Negative z-index
     for z in [1, 10]:
-        add_rule(f".z-n{z}", {"z-index": str(-z)}, is_important)
+        add_rule(f".z-n{z}", {"z-index": str(-z)})
 
-def generate_object(is_important):
+def generate_object():
     # Object-fit
     for fit in ["cover", "contain", "fill", "none", "scale-down"]:
-        add_rule(f".object-fit-{fit}", {"object-fit": fit}, is_important)
+        add_rule(f".object-fit-{fit}", {"object-fit": fit})
     # Object-position
     for pos in ["center", "top", "bottom", "left", "right", "top-left", "top-right", "bottom-left", "bottom-right"]:
         css_val = pos.replace("-", " ")
-        add_rule(f".object-position-{pos}", {"object-position": css_val}, is_important)
+        add_rule(f".object-position-{pos}", {"object-position": css_val})
 
-def generate_aspect_ratio(is_important):
+def generate_aspect_ratio():
     ratios = {
         "square": "1 / 1",
         "video": "16 / 9",
@@ -285,9 +632,9 @@ def generate_aspect_ratio(is_important):
         "1": "1 / 1",
     }
     for name, val in ratios.items():
-        add_rule(f".aspect-{name}", {"aspect-ratio": val}, is_important)
+        add_rule(f".aspect-{name}", {"aspect-ratio": val})
 
-def generate_typography_extended(is_important):
+def generate_typography_extended():
     # Line-height
     line_heights = {
         "1": "1",
@@ -297,7 +644,7 @@ def generate_typography_extended(is_important):
         "xl": "2",
     }
     for name, val in line_heights.items():
-        add_rule(f".lh-{name}", {"line-height": val}, is_important)
+        add_rule(f".lh-{name}", {"line-height": val})
 
     # Letter-spacing
     letter_spacings = {
@@ -309,20 +656,20 @@ def generate_typography_extended(is_important):
         "widest": "0.1em",
     }
     for name, val in letter_spacings.items():
-        add_rule(f".ls-{name}", {"letter-spacing": val}, is_important)
+        add_rule(f".ls-{name}", {"letter-spacing": val})
 
     # Font-family
-    add_rule(".font-sans", {"font-family": "var(--font-sans, system-ui, -apple-system, sans-serif)"}, is_important)
-    add_rule(".font-serif", {"font-family": "var(--font-serif, Georgia, serif)"}, is_important)
-    add_rule(".font-mono", {"font-family": "var(--font-mono, ui-monospace, monospace)"}, is_important)
+    add_rule(".font-sans", {"font-family": "var(--font-sans, system-ui, -apple-system, sans-serif)"})
+    add_rule(".font-serif", {"font-family": "var(--font-serif, Georgia, serif)"})
+    add_rule(".font-mono", {"font-family": "var(--font-mono, ui-monospace, monospace)"})
 
     # Text truncate (single line ellipsis)
-    add_rule(".text-truncate", {"overflow": "hidden", "text-overflow": "ellipsis", "white-space": "nowrap"}, is_important)
-    add_rule(".truncate", {"overflow": "hidden", "text-overflow": "ellipsis", "white-space": "nowrap"}, is_important)
+    add_rule(".text-truncate", {"overflow": "hidden", "text-overflow": "ellipsis", "white-space": "nowrap"})
+    add_rule(".truncate", {"overflow": "hidden", "text-overflow": "ellipsis", "white-space": "nowrap"})
 
     # White-space (more complete)
     for ws in ["normal", "nowrap", "pre", "pre-wrap", "pre-line", "break-spaces"]:
-        add_rule(f".ws-{ws}", {"white-space": ws}, is_important)
+        add_rule(f".ws-{ws}", {"white-space": ws})
 
     # Line-clamp (multi-line truncation)
     for lines in range(1, 7):
@@ -331,50 +678,50 @@ def generate_typography_extended(is_important):
             "-webkit-line-clamp": str(lines),
             "-webkit-box-orient": "vertical",
             "overflow": "hidden"
-        }, is_important)
+        })
 
-def generate_interaction(is_important):
+def generate_interaction():
     # Pointer-events
-    add_rule(".pointer-events-none", {"pointer-events": "none"}, is_important)
-    add_rule(".pointer-events-auto", {"pointer-events": "auto"}, is_important)
+    add_rule(".pointer-events-none", {"pointer-events": "none"})
+    add_rule(".pointer-events-auto", {"pointer-events": "auto"})
 
     # User-select
     for sel in ["none", "text", "all", "auto"]:
-        add_rule(f".user-select-{sel}", {"user-select": sel}, is_important)
+        add_rule(f".user-select-{sel}", {"user-select": sel})
 
     # Touch-action
     for ta in ["none", "pan-x", "pan-y", "manipulation", "auto"]:
-        add_rule(f".touch-action-{ta}", {"touch-action": ta}, is_important)
+        add_rule(f".touch-action-{ta}", {"touch-action": ta})
 
-def generate_transforms(is_important):
+def generate_transforms():
     # Translate X/Y percentages
     for axis in ["x", "y"]:
         for pct in [0, 25, 50, 100]:
-            add_rule(f".translate-{axis}-{pct}", {"transform": f"translate{axis.upper()}({pct}%)"}, is_important)
+            add_rule(f".translate-{axis}-{pct}", {"transform": f"translate{axis.upper()}({pct}%)"})
         # Negative translations
         for pct in [25, 50, 100]:
-            add_rule(f".translate-{axis}-n{pct}", {"transform": f"translate{axis.upper()}(-{pct}%)"}, is_important)
+            add_rule(f".translate-{axis}-n{pct}", {"transform": f"translate{axis.upper()}(-{pct}%)"})
 
     # Rotate
     for deg in [0, 45, 90, 180, 270]:
-        add_rule(f".rotate-{deg}", {"transform": f"rotate({deg}deg)"}, is_important)
+        add_rule(f".rotate-{deg}", {"transform": f"rotate({deg}deg)"})
     # Negative rotations
     for deg in [45, 90, 180]:
-        add_rule(f".rotate-n{deg}", {"transform": f"rotate(-{deg}deg)"}, is_important)
+        add_rule(f".rotate-n{deg}", {"transform": f"rotate(-{deg}deg)"})
 
     # Scale
     for scale in [0, 50, 75, 90, 95, 100, 105, 110, 125, 150]:
-        add_rule(f".scale-{scale}", {"transform": f"scale({scale/100})"}, is_important)
+        add_rule(f".scale-{scale}", {"transform": f"scale({scale/100})"})
 
-def generate_sizing_extended(is_important):
+def generate_sizing_extended():
     # Min-width
-    add_rule(".min-w-0", {"min-width": "0"}, is_important)
-    add_rule(".min-w-full", {"min-width": "100%"}, is_important)
+    add_rule(".min-w-0", {"min-width": "0"})
+    add_rule(".min-w-full", {"min-width": "100%"})
 
     # Min-height
-    add_rule(".min-h-0", {"min-height": "0"}, is_important)
-    add_rule(".min-h-full", {"min-height": "100%"}, is_important)
-    add_rule(".min-h-screen", {"min-height": "100vh"}, is_important)
+    add_rule(".min-h-0", {"min-height": "0"})
+    add_rule(".min-h-full", {"min-height": "100%"})
+    add_rule(".min-h-screen", {"min-height": "100vh"})
 
     # Max-width (container widths)
     max_widths = {
@@ -397,54 +744,54 @@ def generate_sizing_extended(is_important):
         "screen-xl": "1280px",
     }
     for name, val in max_widths.items():
-        add_rule(f".max-w-{name}", {"max-width": val}, is_important)
+        add_rule(f".max-w-{name}", {"max-width": val})
 
     # Max-height
-    add_rule(".max-h-full", {"max-height": "100%"}, is_important)
-    add_rule(".max-h-screen", {"max-height": "100vh"}, is_important)
+    add_rule(".max-h-full", {"max-height": "100%"})
+    add_rule(".max-h-screen", {"max-height": "100vh"})
 
-def generate_flexgrid_extended(is_important):
+def generate_flexgrid_extended():
     # Order
     for i in range(13):  # 0-12
-        add_rule(f".order-{i}", {"order": str(i)}, is_important)
-    add_rule(".order-first", {"order": "-9999"}, is_important)
-    add_rule(".order-last", {"order": "9999"}, is_important)
-    add_rule(".order-none", {"order": "0"}, is_important)
+        add_rule(f".order-{i}", {"order": str(i)})
+    add_rule(".order-first", {"order": "-9999"})
+    add_rule(".order-last", {"order": "9999"})
+    add_rule(".order-none", {"order": "0"})
 
     # Grid template columns
     for cols in range(1, 13):
-        add_rule(f".grid-cols-{cols}", {"grid-template-columns": f"repeat({cols}, minmax(0, 1fr))"}, is_important)
-    add_rule(".grid-cols-none", {"grid-template-columns": "none"}, is_important)
+        add_rule(f".grid-cols-{cols}", {"grid-template-columns": f"repeat({cols}, minmax(0, 1fr))"})
+    add_rule(".grid-cols-none", {"grid-template-columns": "none"})
 
     # Column span
     for span in range(1, 13):
-        add_rule(f".col-span-{span}", {"grid-column": f"span {span} / span {span}"}, is_important)
-    add_rule(".col-span-full", {"grid-column": "1 / -1"}, is_important)
+        add_rule(f".col-span-{span}", {"grid-column": f"span {span} / span {span}"})
+    add_rule(".col-span-full", {"grid-column": "1 / -1"})
 
     # Grid rows
     for rows in range(1, 7):
-        add_rule(f".grid-rows-{rows}", {"grid-template-rows": f"repeat({rows}, minmax(0, 1fr))"}, is_important)
-    add_rule(".grid-rows-none", {"grid-template-rows": "none"}, is_important)
+        add_rule(f".grid-rows-{rows}", {"grid-template-rows": f"repeat({rows}, minmax(0, 1fr))"})
+    add_rule(".grid-rows-none", {"grid-template-rows": "none"})
 
     # Row span
     for span in range(1, 7):
-        add_rule(f".row-span-{span}", {"grid-row": f"span {span} / span {span}"}, is_important)
-    add_rule(".row-span-full", {"grid-row": "1 / -1"}, is_important)
+        add_rule(f".row-span-{span}", {"grid-row": f"span {span} / span {span}"})
+    add_rule(".row-span-full", {"grid-row": "1 / -1"})
 
     # Place-items
     for val in ["center", "start", "end", "stretch"]:
-        add_rule(f".place-items-{val}", {"place-items": val}, is_important)
+        add_rule(f".place-items-{val}", {"place-items": val})
 
     # Place-content
     for val in ["center", "start", "end", "stretch", "between", "around", "evenly"]:
         css_val = f"space-{val}" if val in ["between", "around", "evenly"] else val
-        add_rule(f".place-content-{val}", {"place-content": css_val}, is_important)
+        add_rule(f".place-content-{val}", {"place-content": css_val})
 
     # Place-self
     for val in ["center", "start", "end", "stretch", "auto"]:
-        add_rule(f".place-self-{val}", {"place-self": val}, is_important)
+        add_rule(f".place-self-{val}", {"place-self": val})
 
-def generate_accessibility(is_important):
+def generate_accessibility():
     # Screen reader only
     add_rule(".sr-only", {
         "position": "absolute",
@@ -456,7 +803,7 @@ def generate_accessibility(is_important):
         "clip": "rect(0, 0, 0, 0)",
         "white-space": "nowrap",
         "border-width": "0"
-    }, is_important)
+    })
 
     # Not screen reader only (undo sr-only)
     add_rule(".not-sr-only", {
@@ -468,181 +815,1672 @@ def generate_accessibility(is_important):
         "overflow": "visible",
         "clip": "auto",
         "white-space": "normal"
-    }, is_important)
-
-def main():
-    print("Generating CSS...")
+    })
+
+GENERATORS = [
+    generate_spacing,
+    generate_display,
+    generate_position,
+    generate_flex,
+    generate_typography,
+    generate_sizing,
+    generate_borders,
+    generate_effects,
+    generate_overflow,
+    generate_zindex,
+    generate_object,
+    generate_aspect_ratio,
+    generate_typography_extended,
+    generate_interaction,
+    generate_transforms,
+    generate_sizing_extended,
+    generate_flexgrid_extended,
+    generate_accessibility,
+]
 
-    # Generate standard rules
-    generate_spacing(False)
-    generate_display(False)
-    generate_position(False)
-    generate_flex(False)
-    generate_typography(False)
-    generate_sizing(False)
-    generate_borders(False)
-    generate_effects(False)
-    generate_overflow(False)
-    generate_zindex(False)
-    generate_object(False)
-    generate_aspect_ratio(False)
-    generate_typography_extended(False)
-    generate_interaction(False)
-    generate_transforms(False)
-    generate_sizing_extended(False)
-    generate_flexgrid_extended(False)
-    generate_accessibility(False)
-
-    # Generate !important rules
-    generate_spacing(True)
-    generate_display(True)
-    generate_position(True)
-    generate_flex(True)
-    generate_typography(True)
-    generate_sizing(True)
-    generate_borders(True)
-    generate_effects(True)
-    generate_overflow(True)
-    generate_zindex(True)
-    generate_object(True)
-    generate_aspect_ratio(True)
-    generate_typography_extended(True)
-    generate_interaction(True)
-    generate_transforms(True)
-    generate_sizing_extended(True)
-    generate_flexgrid_extended(True)
-    generate_accessibility(True)
-    
-    # full_css = "\n".join(css_rules)
-    # minified_css = rcssmin.cssmin(full_css)
-    
-    # Simple manual minification
-    minified_css = "".join(css_rules).replace(": ", ":").replace("; ", ";").replace(" {", "{").replace("} ", "}")
-    
-    # Write CSS
-    os.makedirs(os.path.dirname(OUTPUT_CSS_PATH), exist_ok=True)
-    with open(OUTPUT_CSS_PATH, "w") as f:
-        f.write(minified_css)
-        
-    print(f"Generated {len(css_rules)} rules into {OUTPUT_CSS_PATH}")
+# Content scanning (JIT purge)
+def scan_file(path):
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            return scan_text(f.read())
+    except OSError:
+        return set()
+
+def scan_text(text):
+    tokens = set(CLASS_TOKEN_RE.findall(text))
+    # `{a:p-3}` in a JS object is not a variant, but p-3 may still be a class
+    for token in [token for token in tokens if ":" in token]:
+        if parse_variant(token) is None:
+            tokens.update(token.split(":"))
+    return tokens
+
+def expand_content_globs(patterns):
+    paths = set()
+    for pattern in patterns.split(","):
+        pattern = pattern.strip()
+        if pattern:
+            paths.update(glob.glob(pattern, recursive=True))
+    return sorted(p for p in paths if os.path.isfile(p))
+
+def process_map(fn, items, jobs=None):
+    if not items:
+        return []
+    # Big chunks keep the per-file IPC overhead negligible on large trees
+    workers = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, items, chunksize=chunksize))
+
+def scan_files(paths, jobs=None):
+    return process_map(scan_file, paths, jobs)
+
+def scan_content(paths, jobs=None):
+    used = set()
+    for tokens in scan_files(paths, jobs):
+        used |= tokens
+    return used
+
+# Persistent class-usage index: path -> stamp, content hash and tokens, so a build only
+# rereads the files whose mtime or size changed and only rescans those whose hash did
+USAGE_INDEX_VERSION = 1
+USAGE_REPORT_TOP = 10
+
+def index_file(job):
+    # -> (stamp, content hash, tokens or None when the hash is unchanged)
+    path, known_hash = job
+    stamp = file_stamp(path)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return stamp, None, set()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_hash:
+        return stamp, digest, None
+    return stamp, digest, scan_text(data.decode("utf-8", errors="ignore"))
+
+def load_usage_index(path):
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != USAGE_INDEX_VERSION:
+        return {}
+    return index["files"]
+
+def update_usage_index(paths, index_path, jobs=None):
+    # -> token set per path, in the same order
+    files = load_usage_index(index_path)
+    dirty = []
+    for path in paths:
+        stamp = file_stamp(path)
+        if path not in files or files[path]["stamp"] != (list(stamp) if stamp else None):
+            dirty.append(path)
+    jobs_list = [(path, files.get(path, {}).get("hash")) for path in dirty]
+    rescanned = 0
+    for path, (stamp, digest, tokens) in zip(dirty, process_map(index_file, jobs_list, jobs)):
+        stamp = list(stamp) if stamp else None
+        if tokens is None:
+            files[path]["stamp"] = stamp
+        else:
+            # Tokens never contain spaces, one string per file keeps the index small
+            files[path] = {"stamp": stamp, "hash": digest, "tokens": " ".join(sorted(tokens))}
+            rescanned += 1
+    removed = files.keys() - set(paths)
+    for path in removed:
+        del files[path]
+    if dirty or removed:
+        with open(index_path, "w") as f:
+            json.dump({"version": USAGE_INDEX_VERSION, "files": files}, f, separators=(",", ":"))
+    print(f"Usage index: rescanned {rescanned} of {len(paths)} files ({len(dirty) - rescanned} touched but unchanged, {len(removed)} removed)")
+    return [set(files[path]["tokens"].split()) for path in paths]
+
+def base_class_name(token):
+    # `md:hover:p-3-imp` -> `p-3`
+    parsed = parse_variant(token)
+    name = parsed[2] if parsed else token
+    return name[:-len("-imp")] if name.endswith("-imp") else name
+
+def usage_report(registry, paths, per_file):
+    # registry is the full (unpurged) rule set, so unused utilities show up
+    used = Counter()
+    templates = []
+    for path, tokens in zip(paths, per_file):
+        names = {name for name in map(base_class_name, tokens) if "." + name in registry}
+        used.update(names)
+        templates.append({"path": path, "classes": len(names)})
+    templates.sort(key=lambda template: (-template["classes"], template["path"]))
+
+    sections = {}
+    for rule in registry:
+        sections.setdefault(rule.section, []).append(rule)
+    report = {"files": len(paths), "sections": {}, "templates": templates[:USAGE_REPORT_TOP]}
+    for name, rules in sections.items():
+        used_rules = [rule for rule in rules if used[rule.class_name()]]
+        report["sections"][name] = {
+            "classes": len(rules),
+            "used": len(used_rules),
+            # Folded like the style guide: the range each family can be narrowed to
+            "used_patterns": [render_pattern(prefixes, pattern, []) for prefixes, pattern, _, _ in section_patterns(used_rules)],
+            "unused": [rule.class_name() for rule in rules if not used[rule.class_name()]],
+        }
+    return report
+
+def print_usage_report(report):
+    print(f"Utility usage across {report['files']} files:")
+    for name, section in report["sections"].items():
+        patterns = ", ".join(section["used_patterns"]) or "none used"
+        print(f"  {name:<22}{section['used']:>5} of {section['classes']:<6}{patterns}")
+    print("Templates using the most utilities:")
+    for template in report["templates"]:
+        print(f"  {template['classes']:>5}  {template['path']}")
+
+# Incremental builds
+def section_fingerprint(module, generate):
+    # Hash the generator's code plus every table and helper it reaches, so editing
+    # e.g. COLORS only invalidates the sections that read COLORS
+    digest = hashlib.sha256()
+    seen = set()
+
+    def feed(code):
+        digest.update(code.co_code)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                feed(const)
+            else:
+                digest.update(repr(const).encode())
+        for name in code.co_names:
+            if name in seen or not hasattr(module, name):
+                continue
+            seen.add(name)
+            value = getattr(module, name)
+            if isinstance(value, types.FunctionType):
+                feed(value.__code__)
+            elif isinstance(value, type):
+                # The repr names the defining module, which differs for reloaded copies
+                for attr in vars(value).values():
+                    if isinstance(attr, types.FunctionType):
+                        feed(attr.__code__)
+            elif not isinstance(value, types.ModuleType):
+                digest.update(f"{name}={value!r}".encode())
+
+    feed(generate.__code__)
+    return digest.hexdigest()
+
+def section_name(generate):
+    return generate.__name__[len("generate_"):]
+
+def run_section(module, generate):
+    rules = module.rule_sink = []
+    try:
+        generate()
+    finally:
+        module.rule_sink = None
+    name = section_name(generate)
+    for rule in rules:
+        rule.section = name
+    return tuple(rules)
+
+def collect_rules(module, used=None, cache=None, variants=(), timings=None):
+    # cache maps generator name -> (fingerprint, rules) between watch rebuilds,
+    # timings (if given) receives section name -> seconds spent generating it
+    if used is not None:
+        # Pixel utilities are only generated for the values the templates ask for
+        module.px_values = requested_px_values(used | set(variants))
+    else:
+        module.px_values = module.PX_RANGE
+    if cache is None:
+        cache = {}
+
+    registry = RuleRegistry()
+    rebuilt = 0
+    for generate in module.GENERATORS:
+        key = generate.__name__
+        fingerprint = section_fingerprint(module, generate)
+        entry = cache.get(key)
+        started = time.perf_counter()
+        if entry is None or entry[0] != fingerprint:
+            entry = cache[key] = (fingerprint, run_section(module, generate))
+            rebuilt += 1
+        if timings is not None:
+            timings[section_name(generate)] = time.perf_counter() - started
+        for rule in entry[1]:
+            registry.add(rule)
+    return registry, rebuilt
+
+def write_if_changed(path, data, digests):
+    # digests remembers what we last wrote so watch mode never has to re-read outputs
+    new_digest = hashlib.sha256(data).hexdigest()
+    old_digest = digests.get(path)
+    if old_digest is None and os.path.exists(path):
+        with open(path, "rb") as f:
+            old_digest = hashlib.sha256(f.read()).hexdigest()
+    if new_digest == old_digest:
+        digests[path] = new_digest
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    digests[path] = new_digest
+    return True
+
+# Precompression
+def compress_with_binary(command, data):
+    return subprocess.run(command, input=data, stdout=subprocess.PIPE, check=True).stdout
+
+def brotli_compress(data):
+    if brotli is not None:
+        return brotli.compress(data, quality=11)
+    return compress_with_binary(["brotli", "-c", "-q", "11"], data)
+
+def gzip_compress(data):
+    # mtime=0 keeps the output reproducible so unchanged builds stay byte-identical
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def zstd_compress(data):
+    if zstd is not None:
+        return zstd.compress(data, level=19)
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    return compress_with_binary(["zstd", "-c", "-q", "-19"], data)
+
+# Encoding name -> (file extension, compressor)
+COMPRESSORS = {
+    "br": (".br", brotli_compress),
+    "gz": (".gz", gzip_compress),
+    "zst": (".zst", zstd_compress),
+}
 
-    # Compress with Brotli (using system command)
+def compress_variants(data, encodings):
+    # The compressors release the GIL, so a thread pool runs them truly in parallel
+    def run(encoding):
+        try:
+            return COMPRESSORS[encoding][1](data)
+        except Exception as e:
+            print(f"Skipping .{encoding}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(encodings) or 1) as pool:
+        results = dict(zip(encodings, pool.map(run, encodings)))
+    return {encoding: result for encoding, result in results.items() if result is not None}
+
+def write_compressed(path, data, encodings, digests, force):
+    paths = {encoding: path + COMPRESSORS[encoding][0] for encoding in encodings}
+    if not force:
+        # Source unchanged: only fill in variants that are missing on disk
+        encodings = [encoding for encoding in encodings if not os.path.exists(paths[encoding])]
+    if encodings:
+        sizes = []
+        for encoding, compressed in compress_variants(data, encodings).items():
+            write_if_changed(paths[encoding], compressed, digests)
+            sizes.append(f"{encoding} {len(compressed):,} B")
+        if sizes:
+            print(f"Compressed {len(data):,} B -> " + ", ".join(sizes))
+    return {encoding: path for encoding, path in paths.items() if os.path.exists(path)}
+
+# Streaming compressors: factory(output file) -> object with compress(chunk) and flush()
+class BinaryStream:
+    # External compressor fed through a pipe, writing straight into the output file
+    def __init__(self, command, out):
+        self.command = command
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=out)
+
+    def compress(self, data):
+        self.process.stdin.write(data)
+        return b""
+
+    def flush(self):
+        self.process.stdin.close()
+        if self.process.wait():
+            raise subprocess.CalledProcessError(self.process.returncode, self.command)
+        return b""
+
+class BrotliStream:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=11)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+def brotli_stream(out):
+    if brotli is not None:
+        return BrotliStream()
+    return BinaryStream(["brotli", "-c", "-q", "11"], out)
+
+def gzip_stream(out):
+    # Same bytes as gzip_compress(): wbits=31 writes a gzip header with mtime 0
+    return zlib.compressobj(9, zlib.DEFLATED, 31)
+
+def zstd_stream(out):
+    if zstd is not None:
+        return zstd.ZstdCompressor(level=19)
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=19).compressobj()
+    return BinaryStream(["zstd", "-c", "-q", "-19"], out)
+
+STREAM_COMPRESSORS = {
+    "br": brotli_stream,
+    "gz": gzip_stream,
+    "zst": zstd_stream,
+}
+# Bytes collected before a chunk goes to the file and the compressors
+STREAM_CHUNK_SIZE = 1 << 16
+
+def compress_stream(compressor, out, chunks, errors):
+    # Runs on its own thread; keeps draining after a failure so the writer never blocks
+    failed = False
+    while True:
+        chunk = chunks.get()
+        try:
+            if chunk is None:
+                if not failed:
+                    out.write(compressor.flush())
+                return
+            if not failed:
+                out.write(compressor.compress(chunk))
+        except Exception as e:
+            errors.append(e)
+            failed = True
+            if chunk is None:
+                return
+
+# Content hashed assets
+def hashed_path(path, data):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:CONTENT_HASH_LENGTH]}{ext}"
+
+def write_asset(path, data, encodings, digests, content_hash=False):
+    # Returns (written path, changed, manifest entry)
+    if content_hash:
+        path = hashed_path(path, data)
+    changed = write_if_changed(path, data, digests)
+    if not changed and content_hash:
+        # Mark it as the most recent build for prune_hashed_assets()
+        os.utime(path)
+    variants = write_compressed(path, data, encodings, digests, force=changed)
+    entry = {
+        "file": os.path.basename(path),
+        "size": len(data),
+        "variants": {
+            encoding: {"file": os.path.basename(variant), "size": os.path.getsize(variant)}
+            for encoding, variant in variants.items()
+        },
+    }
+    return path, changed, entry
+
+def write_stream(path, pieces, encodings, digests, content_hash=False):
+    # write_asset() for an iterator of strings: every chunk is written to a temporary file
+    # and handed to one compressor thread per encoding, so the whole stylesheet is never
+    # held in memory. The temporary files replace the outputs only if the CSS changed.
+    # Returns (written path, changed, manifest entry)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = path + ".tmp"
+    streams = {}
+    digest = hashlib.sha256()
+    size = 0
+    completed = False
     try:
-        import subprocess
-        br_path = OUTPUT_CSS_PATH + ".br"
-        subprocess.run(["brotli", "-f", "-q", "11", "-o", br_path, OUTPUT_CSS_PATH], check=True)
-        print(f"Compressed to {br_path}")
-    except Exception as e:
-        print(f"Failed to compress with brotli: {e}")
-    
-    # Write Documentation
-    docs = """# CSS Utility Classes
-
-This file is auto-generated. Do not edit manually.
-
-## Features
-- **Suffix:** Add `-imp` to any class to apply `!important`.
-
-## Spacing
-- **Padding:** `.p{side}-{level}` or `.p{side}-{px}px`
-- **Margin:** `.m{side}-{level}` or `.m{side}-{px}px` or `.m{side}-auto`
-  - Sides: `t` (top), `b` (bottom), `s` (left), `e` (right), `x` (horiz), `y` (vert), `` (all)
-  - Levels: 0-6 (0, 0.25rem, 0.5rem, 1rem, 1.5rem, 3rem, 4rem)
-  - Pixels: 1-100px
-
-## Display & Position
-- `.d-{none|inline|block|flex|grid...}`
-- `.position-{static|relative|absolute|fixed|sticky}`
-- `.{top|bottom|left|right}-{0|50|100}`
-
-## Overflow
-- `.overflow-{hidden|scroll|auto|visible}`
-- `.overflow-x-{auto|hidden|scroll}`, `.overflow-y-{auto|hidden|scroll}`
-
-## Z-Index
-- `.z-{0|10|20|30|40|50|auto}`
-- `.z-n{1|10}` (negative)
-
-## Object Fit & Position
-- `.object-fit-{cover|contain|fill|none|scale-down}`
-- `.object-position-{center|top|bottom|left|right|top-left|...}`
-
-## Aspect Ratio
-- `.aspect-{square|video|4-3|3-2|16-9|21-9|1}`
-
-## Flexbox
-- `.flex-{row|column|...}`
-- `.flex-{wrap|nowrap}`
-- `.justify-content-{start|end|center|between|around|evenly}`
-- `.align-items-{start|end|center|baseline|stretch}`
-- `.align-content-{start|end|center|between|around|stretch}`
-- `.align-self-{auto|start|end|center|baseline|stretch}`
-- `.flex-grow-{0|1}`, `.flex-shrink-{0|1}`, `.flex-fill`
-- `.gap-{0-10}` (0.25rem steps)
-- `.order-{0-12|first|last|none}`
-
-## Grid
-- `.grid-cols-{1-12|none}` (template columns)
-- `.col-span-{1-12|full}`
-- `.grid-rows-{1-6|none}` (template rows)
-- `.row-span-{1-6|full}`
-- `.place-items-{center|start|end|stretch}`
-- `.place-content-{center|start|end|stretch|between|around|evenly}`
-- `.place-self-{center|start|end|stretch|auto}`
-
-## Typography
-- `.text-{start|end|center|justify}`
-- `.text-{lowercase|uppercase|capitalize}`
-- `.text-decoration-{none|underline|line-through}`
-- `.text-{wrap|nowrap|break}`
-- `.fw-{light|normal|bold|bolder|100-900}`
-- `.fs-{1-6}` (headings scale)
-- `.text-{color}`, `.bg-{color}` (using `var(--color-{name})`)
-- `.lh-{1|sm|base|lg|xl}` (line-height)
-- `.ls-{tighter|tight|normal|wide|wider|widest}` (letter-spacing)
-- `.font-{sans|serif|mono}`
-- `.ws-{normal|nowrap|pre|pre-wrap|pre-line|break-spaces}` (white-space)
-- `.text-truncate`, `.truncate` (single line ellipsis)
-- `.line-clamp-{1-6}` (multi-line truncation)
-
-## Sizing
-- `.w-{25|50|75|100|auto}`, `.h-{25|50|75|100|auto}`
-- `.w-{1-100}px`, `.h-{1-100}px`
-- `.mw-100`, `.mh-100`, `.vw-100`, `.vh-100`
-- `.min-w-{0|full}`, `.min-h-{0|full|screen}`
-- `.max-w-{xs|sm|md|lg|xl|2xl|3xl|4xl|5xl|6xl|7xl|full|prose|screen-sm|screen-md|screen-lg|screen-xl}`
-- `.max-h-{full|screen}`
-
-## Borders
-- `.border`, `.border-{side}`, `.border-0`, `.border-{side}-0`
-- `.border-{color}`
-- `.rounded`, `.rounded-{0|circle|pill|sm|lg|xl}`
-
-## Effects
-- `.opacity-{0-100}` (step 5)
-- `.cursor-{auto|pointer|...}`
-- `.visible`, `.invisible`
-
-## Transforms
-- `.translate-x-{0|25|50|100}`, `.translate-y-{0|25|50|100}`
-- `.translate-x-n{25|50|100}`, `.translate-y-n{25|50|100}` (negative)
-- `.rotate-{0|45|90|180|270}`, `.rotate-n{45|90|180}` (negative)
-- `.scale-{0|50|75|90|95|100|105|110|125|150}`
-
-## Interaction
-- `.pointer-events-{none|auto}`
-- `.user-select-{none|text|all|auto}`
-- `.touch-action-{none|pan-x|pan-y|manipulation|auto}`
-
-## Accessibility
-- `.sr-only` (screen reader only)
-- `.not-sr-only` (undo sr-only)
+        for encoding in encodings:
+            extension, _ = COMPRESSORS[encoding]
+            out = open(temp + extension, "wb")
+            try:
+                compressor = STREAM_COMPRESSORS[encoding](out)
+            except Exception as e:
+                print(f"Skipping .{encoding}: {e}")
+                out.close()
+                os.remove(temp + extension)
+                continue
+            chunks = queue.Queue(maxsize=4)
+            errors = []
+            thread = threading.Thread(target=compress_stream, args=(compressor, out, chunks, errors))
+            thread.start()
+            streams[encoding] = (extension, out, chunks, errors, thread)
+
+        with open(temp, "wb") as f:
+            buffer, buffered = [], 0
+            for piece in itertools.chain(pieces, [None]):
+                if piece is not None:
+                    buffer.append(piece)
+                    buffered += len(piece)
+                    if buffered < STREAM_CHUNK_SIZE:
+                        continue
+                chunk = "".join(buffer).encode()
+                buffer, buffered = [], 0
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                for _, _, chunks, _, _ in streams.values():
+                    chunks.put(chunk)
+        completed = True
+    finally:
+        # Also when serializing or writing failed: the compressor threads only stop at
+        # their None, and the half-written temporary files must not stay behind
+        for _, out, chunks, _, thread in streams.values():
+            chunks.put(None)
+            thread.join()
+            out.close()
+        if not completed:
+            for name in [temp] + [temp + extension for extension, _, _, _, _ in streams.values()]:
+                if os.path.exists(name):
+                    os.remove(name)
+
+    new_digest = digest.hexdigest()
+    if content_hash:
+        root, ext = os.path.splitext(path)
+        path = f"{root}.{new_digest[:CONTENT_HASH_LENGTH]}{ext}"
+    old_digest = digests.get(path)
+    if old_digest is None and os.path.exists(path):
+        old = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+                old.update(block)
+        old_digest = old.hexdigest()
+    changed = new_digest != old_digest
+    if changed:
+        os.replace(temp, path)
+    else:
+        os.remove(temp)
+        if content_hash:
+            # Mark it as the most recent build for prune_hashed_assets()
+            os.utime(path)
+    digests[path] = new_digest
+
+    variants = {}
+    sizes = []
+    for encoding, (extension, _, _, errors, _) in streams.items():
+        if errors:
+            print(f"Skipping .{encoding}: {errors[0]}")
+            os.remove(temp + extension)
+        elif changed or not os.path.exists(path + extension):
+            os.replace(temp + extension, path + extension)
+            sizes.append(f"{encoding} {os.path.getsize(path + extension):,} B")
+        else:
+            os.remove(temp + extension)
+        if os.path.exists(path + extension):
+            variants[encoding] = path + extension
+    if sizes:
+        print(f"Compressed {size:,} B -> " + ", ".join(sizes))
+    entry = {
+        "file": os.path.basename(path),
+        "size": size,
+        "variants": {
+            encoding: {"file": os.path.basename(variant), "size": os.path.getsize(variant)}
+            for encoding, variant in variants.items()
+        },
+    }
+    return path, changed, entry
+
+def update_manifest(directory, entries, digests):
+    # Other logical names already in the manifest are kept
+    path = os.path.join(directory, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+    manifest.update(entries)
+    write_if_changed(path, (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode(), digests)
+    return path
+
+def prune_hashed_assets(path, current, keep):
+    # Keep the `keep` newest generated.<hash>.css builds (current included) and their variants
+    directory = os.path.dirname(path)
+    root, ext = os.path.splitext(os.path.basename(path))
+    pattern = re.compile(re.escape(root) + r"\.[0-9a-f]{%d}" % CONTENT_HASH_LENGTH + re.escape(ext))
+    current = os.path.basename(current)
+    builds = [name for name in os.listdir(directory) if pattern.fullmatch(name) and name != current]
+    builds.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    for name in builds[max(keep - 1, 0):]:
+        for suffix in [""] + [extension for extension, _ in COMPRESSORS.values()]:
+            stale = os.path.join(directory, name + suffix)
+            if os.path.exists(stale):
+                os.remove(stale)
+        print(f"Pruned {name}")
+
+def cluster_key(entry):
+    # Rules with the same properties and value shape compress well next to each other:
+    # `.p-1{padding:.25rem}` and `.p-2{padding:.5rem}` share everything but the digits
+    # (-imp rules share the cluster of their normal twins)
+    _, pseudo, rule, _ = entry
+    return tuple(prop + ":" + NUMBER_RE.sub("0", value) for prop, value in rule.declarations), pseudo
+
+def compression_order(entries):
+    # Topological sort: entries that share a property family (and importance) keep their
+    # relative order through one chain per family, everything else may move. Greedy: stay
+    # on the last cluster while one of its entries is ready, else take the smallest cluster
+    keys = [cluster_key(entry) for entry in entries]
+    families = [
+        {(property_family(prop), entry[3]) for prop, _ in entry[2].declarations}
+        for entry in entries
+    ]
+    chains = {}
+    for index, entry_families in enumerate(families):
+        for family in entry_families:
+            chains.setdefault(family, deque()).append(index)
+    heads = [0] * len(entries)
+    ready = {}
+    key_heap = []
+
+    def head_of(index):
+        heads[index] += 1
+        if heads[index] == len(families[index]):
+            bucket = ready.setdefault(keys[index], [])
+            if not bucket:
+                heapq.heappush(key_heap, keys[index])
+            heapq.heappush(bucket, index)
+
+    for chain in chains.values():
+        head_of(chain[0])
+    order = []
+    last = None
+    while len(order) < len(entries):
+        if not ready.get(last):
+            last = heapq.heappop(key_heap)
+            while not ready.get(last):
+                last = heapq.heappop(key_heap)
+        index = heapq.heappop(ready[last])
+        order.append(entries[index])
+        for family in families[index]:
+            chain = chains[family]
+            chain.popleft()
+            if chain:
+                head_of(chain[0])
+    return order
+
+def merged_blocks(blocks, rename=None):
+    if COMPRESSION_ORDER:
+        blocks = [(media, compression_order(entries)) for media, entries in blocks]
+    return [(media, merge_duplicate_bodies(entries, rename)) for media, entries in blocks]
+
+def render_pieces(blocks, rename=None):
+    # -> (iterator over the minified css, number of output rules). The rule groups are
+    # built up front, the strings only as the iterator is consumed
+    if not CASCADE_LAYER:
+        merged = merged_blocks(blocks, rename)
+        return serialize_blocks(merged), sum(len(groups) for _, groups in merged)
+    # Only the normal half is layered. The -imp rules stay unlayered, which is safe
+    # because their order relative to normal rules never mattered
+    layered = merged_blocks(block_subset(blocks, lambda entry: not entry[3]), rename)
+    unlayered = merged_blocks(block_subset(blocks, lambda entry: entry[3]), rename)
+
+    def pieces():
+        if layered:
+            yield f"@layer {CASCADE_LAYER}{{"
+            yield from serialize_blocks(layered)
+            yield "}"
+        yield from serialize_blocks(unlayered)
+
+    return pieces(), sum(len(groups) for _, groups in layered + unlayered)
+
+def render_blocks(blocks, rename=None):
+    # -> (minified css, number of output rules)
+    pieces, count = render_pieces(blocks, rename)
+    return "".join(pieces), count
+
+def render_stylesheet(registry, used=None, variants=(), rename=None):
+    return render_blocks(stylesheet_blocks(registry, used, variants), rename)
+
+def write_outputs(registry, used, digests, args, frequency=None, catalogue=None, themes=()):
+    # -> (css path, mangled class map or None). catalogue is the unpurged rule set the
+    # kept count is reported against, themes the themed rules the class map must cover too
+    rename = None
+    if args.mangle:
+        names = stylesheet_class_names(registry, used, args.variants)
+        rules = list(registry)
+        for _, theme_rules in themes:
+            names += stylesheet_class_names(RuleRegistry(theme_rules), used, args.variants)
+            rules += theme_rules
+        rename = write_class_map(names, mangle_reserved(rules, used, args), frequency or {}, args.mangle_map, digests)
+    if args.stream:
+        pieces, count = render_pieces(stylesheet_blocks(registry, used, args.variants), rename)
+        path, changed, entry = write_stream(OUTPUT_CSS_PATH, pieces, args.compress, digests, args.content_hash)
+    else:
+        minified_css, count = render_stylesheet(registry, used, args.variants, rename)
+        data = minified_css.encode()
+        path, changed, entry = write_asset(OUTPUT_CSS_PATH, data, args.compress, digests, args.content_hash)
+    if used is not None and catalogue is not None:
+        print(f"Kept {len(output_entries(registry, used))} of {len(output_entries(catalogue))} rules")
+    if changed:
+        print(f"Generated {count} rules into {path}")
+    else:
+        print(f"{path} is unchanged ({count} rules)")
+    if args.content_hash:
+        directory = os.path.dirname(OUTPUT_CSS_PATH)
+        manifest_path = update_manifest(directory, {os.path.basename(OUTPUT_CSS_PATH): entry}, digests)
+        print(f"Updated {manifest_path}")
+        prune_hashed_assets(OUTPUT_CSS_PATH, path, args.keep)
+    return path, rename
+
+def print_order_report(registry, used, variants, encodings, rename=None):
+    # Compressed sizes of the stylesheet in generator order and in compression-aware order
+    global COMPRESSION_ORDER
+    enabled = COMPRESSION_ORDER
+    sizes = []
+    try:
+        for COMPRESSION_ORDER in (False, True):
+            data = render_stylesheet(registry, used, variants, rename)[0].encode()
+            compressed = compress_variants(data, encodings)
+            sizes.append({"raw": len(data), **{encoding: len(compressed[encoding]) for encoding in compressed}})
+    finally:
+        COMPRESSION_ORDER = enabled
+    default, reordered = sizes
+    changes = [
+        f"{metric} {default[metric]:,} -> {reordered[metric]:,} B ({reordered[metric] / default[metric] - 1:+.1%})"
+        for metric in default if metric in reordered and default[metric]
+    ]
+    print("Rule order (default -> compression-aware): " + ", ".join(changes))
+
+# Usage-frequency chunks
+def chunk_tier(name, frequency, files, thresholds):
+    # 0 (core) when the class appears in at least thresholds[0] of the files, and so on
+    share = frequency.get(name, 0) / files if files else 0
+    for index, threshold in enumerate(thresholds):
+        if share >= threshold:
+            return index
+    return len(thresholds)
+
+def split_chunks(blocks, frequency, files, thresholds):
+    # -> one block list per chunk, core first. A chunk also repeats every lower-tier rule
+    # that follows one of its own (or repeated) rules on a shared property family, so with
+    # any chunks loaded in order the later rule still wins, as in the full stylesheet
+    chunks = []
+    for tier in range(len(thresholds) + 1):
+        started = set()
+
+        def keep(entry):
+            name, _, rule, is_important = entry
+            entry_tier = chunk_tier(name, frequency, files, thresholds)
+            if entry_tier > tier:
+                return False
+            families = {(property_family(prop), is_important) for prop, _ in rule.declarations}
+            # A repeated rule moves behind the earlier chunks too, so its families count
+            # from then on
+            if entry_tier == tier or not started.isdisjoint(families):
+                started.update(families)
+                return True
+            return False
+
+        chunks.append(block_subset(blocks, keep))
+    return chunks
+
+def chunk_names(count):
+    return ["core"] + (["extended"] if count == 2 else [f"extended-{n}" for n in range(1, count)])
+
+def write_chunks(registry, used, digests, args, frequency, files, rename=None):
+    blocks = stylesheet_blocks(registry, used, args.variants)
+    chunks = split_chunks(blocks, frequency, files, args.split)
+    root, ext = os.path.splitext(OUTPUT_CSS_PATH)
+    entries = {}
+    for name, threshold, chunk in zip(chunk_names(len(chunks)), args.split + [0], chunks):
+        css, count = render_blocks(chunk, rename)
+        data = css.encode()
+        logical = f"{root}.{name}{ext}"
+        path, _, entry = write_asset(logical, data, args.compress, digests, args.content_hash)
+        entry["rules"] = count
+        entry["min_share"] = threshold
+        entries[os.path.basename(logical)] = entry
+        if args.content_hash:
+            prune_hashed_assets(logical, path, args.keep)
+        print(f"Wrote {name} chunk ({count} rules, {len(data):,} B) into {path}")
+    manifest_path = update_manifest(os.path.dirname(OUTPUT_CSS_PATH), entries, digests)
+    print(f"Listed {len(chunks)} chunks in {manifest_path}")
+
+# Build stats and budgets
+BUDGET_METRICS = ["rules", "declarations", "raw"] + list(COMPRESSORS)
+
+def parse_budget(value):
+    # "total.br=20k" -> ("total", "br", 20480); scopes are total, <section>,
+    # <section>.normal and <section>.imp
+    try:
+        key, limit = value.split("=")
+        scope, metric = key.strip().rsplit(".", 1)
+        limit = limit.strip().lower()
+        limit = int(float(limit[:-1]) * 1024) if limit.endswith("k") else int(limit)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected <scope>.<metric>=<limit>, got {value!r}")
+    if metric not in BUDGET_METRICS:
+        raise argparse.ArgumentTypeError(f"unknown budget metric {metric!r}, expected one of {', '.join(BUDGET_METRICS)}")
+    return scope, metric, limit
+
+def block_subset(blocks, keep):
+    # Same blocks (and order) with only the entries keep() accepts
+    subset = []
+    for media, entries in blocks:
+        entries = [entry for entry in entries if keep(entry)]
+        if entries:
+            subset.append((media, entries))
+    return subset
+
+def subset_stats(blocks, encodings, rename=None):
+    entries = [entry for _, block in blocks for entry in block]
+    css, _ = render_blocks(blocks, rename)
+    data = css.encode()
+    stats = {
+        "rules": len(entries),
+        "declarations": sum(len(entry[2].declarations) for entry in entries),
+        "raw": len(data),
+    }
+    for encoding, compressed in compress_variants(data, encodings).items():
+        stats[encoding] = len(compressed)
+    return stats
+
+def build_stats(registry, used, variants, encodings, timings, rename=None):
+    blocks = stylesheet_blocks(registry, used, variants)
+    report = {"sections": {}, "total": subset_stats(blocks, encodings, rename)}
+    report["total"]["time_ms"] = round(sum(timings.values()) * 1000, 3)
+    for name, seconds in timings.items():
+        section = subset_stats(block_subset(blocks, lambda entry: entry[2].section == name), encodings, rename)
+        section["time_ms"] = round(seconds * 1000, 3)
+        for half, is_important in (("normal", False), ("imp", True)):
+            section[half] = subset_stats(
+                block_subset(blocks, lambda entry: entry[2].section == name and entry[3] == is_important),
+                encodings,
+                rename,
+            )
+        report["sections"][name] = section
+    return report
+
+def check_budgets(report, budgets):
+    # -> list of {"budget", "limit", "actual", "ok"}
+    results = []
+    for scope, metric, limit in budgets:
+        if scope == "total":
+            stats = report["total"]
+        else:
+            section, _, half = scope.partition(".")
+            stats = report["sections"].get(section, {})
+            if half:
+                stats = stats.get(half, {})
+        actual = stats.get(metric)
+        results.append({
+            "budget": f"{scope}.{metric}",
+            "limit": limit,
+            "actual": actual,
+            "ok": actual is not None and actual <= limit,
+        })
+    return results
+
+def print_stats(report, encodings):
+    columns = ["rules", "declarations", "raw"] + encodings
+    header = f"{'section':<28}" + "".join(f"{column:>13}" for column in columns) + f"{'ms':>10}"
+    print(header)
+    rows = []
+    for name, section in report["sections"].items():
+        rows.append((name, section, section["time_ms"]))
+        rows.append((f"  {name}.normal", section["normal"], ""))
+        rows.append((f"  {name}.imp", section["imp"], ""))
+    rows.append(("total", report["total"], report["total"]["time_ms"]))
+    for label, stats, time_ms in rows:
+        print(f"{label:<28}" + "".join(f"{stats.get(column, '-'):>13}" for column in columns) + f"{time_ms:>10}")
+    for result in report.get("budgets", []):
+        status = "ok" if result["ok"] else "OVER BUDGET"
+        print(f"budget {result['budget']}: {result['actual']} / {result['limit']} {status}")
+
+# Class name mangling
+def short_names():
+    # a, b, ..., z, a0, a1, ..., zz, a00, ... (always starts with a letter)
+    for length in itertools.count(1):
+        for first in string.ascii_lowercase:
+            for rest in itertools.product(string.ascii_lowercase + string.digits, repeat=length - 1):
+                yield first + "".join(rest)
+
+def build_class_map(names, frequency, reserved, previous=None):
+    # Classes keep the token they had in `previous`, new ones get the shortest free
+    # token with the most used classes first. Tokens never equal a reserved name
+    # (real utility or template class) or any previously assigned token.
+    previous = previous or {}
+    names = list(dict.fromkeys(names))
+    mapping = {name: previous[name] for name in names if name in previous and previous[name] not in reserved}
+    taken = set(reserved) | set(previous.values())
+    candidates = short_names()
+    # sorted() is stable, so equally used classes stay in cascade order
+    for name in sorted((name for name in names if name not in mapping), key=lambda name: -frequency.get(name, 0)):
+        token = next(candidates)
+        while token in taken:
+            token = next(candidates)
+        mapping[name] = token
+        taken.add(token)
+    return mapping
+
+def mangle_reserved(rules, used, args):
+    # Names a token must never equal: every utility, every scanned class and every
+    # project class in the --rewrite templates
+    reserved = {rule.class_name(is_important) for rule in rules for is_important in (False, True)}
+    reserved |= used or set()
+    if args.rewrite:
+        reserved |= set().union(*scan_files(expand_content_globs(args.rewrite), args.jobs))
+    return reserved
+
+def write_class_map(names, reserved, frequency, path, digests):
+    previous = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+    mapping = build_class_map(names, frequency, reserved, previous)
+    if write_if_changed(path, (json.dumps(mapping, indent=2, sort_keys=True) + "\n").encode(), digests):
+        print(f"Wrote {len(mapping)} mangled class names to {path}")
+    return mapping
+
+rewrite_mapping = None
+
+def init_rewriter(mapping):
+    # Runs once per worker process so the mapping is not pickled for every file
+    global rewrite_mapping
+    rewrite_mapping = mapping
+
+def rewrite_classes(text, mapping):
+    def rewrite_value(match):
+        value = re.sub(r"\S+", lambda token: mapping.get(token.group(), token.group()), match.group(3))
+        return match.group(1) + match.group(2) + value + match.group(2)
+    return CLASS_ATTR_RE.sub(rewrite_value, text)
+
+def rewrite_file(job):
+    source, target = job
+    with open(source, encoding="utf-8") as f:
+        text = f.read()
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "w", encoding="utf-8") as f:
+        f.write(rewrite_classes(text, rewrite_mapping))
+
+def rewrite_templates(paths, out_dir, mapping, jobs=None):
+    # Rewritten copies keep their layout relative to the common root of `paths`
+    if not paths:
+        return
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    job_list = [(path, os.path.join(out_dir, os.path.relpath(os.path.abspath(path), root))) for path in paths]
+    workers = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(job_list) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_rewriter, initargs=(mapping,)) as pool:
+        list(pool.map(rewrite_file, job_list, chunksize=chunksize))
+    print(f"Rewrote {len(paths)} templates into {out_dir}")
+
+# Critical CSS
+CRITICAL_HEAD_TEMPLATE = """<style>{css}</style>
+<link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel='stylesheet'">
+<noscript><link rel="stylesheet" href="{href}"></noscript>
 """
-    
-    with open(OUTPUT_DOCS_PATH, "w") as f:
-        f.write(docs)
-        
-    print(f"Generated documentation at {OUTPUT_DOCS_PATH}")
+
+def write_critical(registry, available, pages_dir, out_dir, href, jobs, digests, rename=None):
+    # One <route>.css per rendered page with only the utilities it uses, plus a
+    # <route>.head.html that inlines it and loads the full stylesheet without blocking.
+    # available are the class names in the full stylesheet, critical CSS stays a subset
+    pages = sorted(glob.glob(os.path.join(pages_dir, "**", "*.html"), recursive=True))
+    total = 0
+    for page, tokens in zip(pages, scan_files(pages, jobs)):
+        route = os.path.splitext(os.path.relpath(page, pages_dir))[0]
+        tokens &= available
+        css, _ = render_stylesheet(registry, tokens, rename=rename)
+        total += len(css)
+        write_if_changed(os.path.join(out_dir, route + ".css"), css.encode(), digests)
+        head = CRITICAL_HEAD_TEMPLATE.format(css=css, href=href)
+        write_if_changed(os.path.join(out_dir, route + ".head.html"), head.encode(), digests)
+    if pages:
+        print(f"Wrote critical CSS for {len(pages)} routes into {out_dir} (avg {total // len(pages):,} B)")
+
+# Style guide, derived from the registry so it never drifts from the generators
+# Class name value: `37px` -> ("", "37", "px"), `n10` -> ("n", "10", "")
+GUIDE_NUMBER_RE = re.compile(r"(n?)(\d+)([a-z%]*)")
+# Declared values: `.25rem` -> (".25", "rem")
+GUIDE_VALUE_RE = re.compile(r"(-?\d*\.?\d+)([a-z%]*)")
+# Rules with more properties leave them out of the guide, the class name has to do
+GUIDE_MAX_PROPERTIES = 3
+# Longer value hints are left out too
+GUIDE_MAX_HINT = 64
+
+def count_tokens(text):
+    if tiktoken is None:
+        # Rough estimate, about four characters per token for CSS-like text
+        return -(-len(text) // 4)
+    return len(tiktoken.get_encoding("cl100k_base").encode(text))
+
+def fold_numbers(numbers):
+    # [0, 5, ..., 100] -> "0-100 step 5", [1, 2, 3] -> "1-3", [0, 50, 100] -> "0|50|100"
+    numbers = sorted(set(numbers))
+    if len(numbers) > 3 or (len(numbers) == 3 and numbers[1] - numbers[0] == 1):
+        step = numbers[1] - numbers[0]
+        if all(b - a == step for a, b in zip(numbers, numbers[1:])):
+            folded = f"{numbers[0]}-{numbers[-1]}"
+            return folded if step == 1 else f"{folded} step {step}"
+    return "|".join(map(str, numbers))
+
+def fold_values(values):
+    # Class name suffixes sharing a prefix -> [(pattern, suffixes in pattern order)], e.g.
+    # ("{25|50|auto}", ["25", "50", "auto"]), ("{1-100}px", [...]), ("n{1|10}", ["n1", "n10"])
+    parts = {}
+    for value in values:
+        match = GUIDE_NUMBER_RE.fullmatch(value)
+        if match:
+            sign, number, unit = match.groups()
+            # Unit-less numbers share one pattern with the words
+            parts.setdefault((sign, unit), []).append(int(number))
+        else:
+            parts.setdefault(("", ""), []).append(value)
+    patterns = []
+    for (sign, unit), items in parts.items():
+        numbers = sorted(item for item in items if isinstance(item, int))
+        words = [item for item in items if not isinstance(item, int)]
+        alternatives = ([fold_numbers(numbers)] if numbers else []) + words
+        spec = "|".join(alternatives)
+        if len(alternatives) > 1 or (numbers and len(numbers) > 1):
+            spec = "{" + spec + "}"
+        patterns.append((sign + spec + unit, [f"{sign}{number}{unit}" for number in numbers] + words))
+    return patterns
+
+def fold_declared(values):
+    # [0, .25rem, ..., 2.5rem] -> "0-2.5rem step .25rem", None unless evenly spaced
+    matches = [GUIDE_VALUE_RE.fullmatch(value) for value in values]
+    if len(values) < 4 or not all(matches):
+        return None
+    units = {match.group(2) for match in matches if float(match.group(1))}
+    if len(units) != 1:
+        return None
+    unit = units.pop()
+    numbers = [float(match.group(1)) for match in matches]
+    step = numbers[1] - numbers[0]
+    if not step or any(abs(b - a - step) > 1e-9 for a, b in zip(numbers, numbers[1:])):
+        return None
+    first, last, step = (normalize_value(f"{number:g}{unit}") for number in (numbers[0], numbers[-1], step))
+    return f"{first}-{last} step {step}"
+
+def value_hint(suffixes, values):
+    # Declared values of one guide line in suffix order, None when the class names
+    # already spell them out (`1-100px`, `auto`) or the list gets too long
+    if all(suffix in value for suffix, value in zip(suffixes, values)):
+        return None
+    hint = fold_declared(values) or "|".join(values)
+    return hint if len(hint) <= GUIDE_MAX_HINT else None
+
+def section_patterns(rules):
+    # -> [(class prefixes, value pattern, properties, value hint or None)] for one section,
+    # in cascade order
+    by_properties = {}
+    for rule in rules:
+        props = tuple(dict.fromkeys(prop for prop, _ in rule.declarations))
+        by_properties.setdefault(props, []).append(rule)
+
+    lines = {}
+    for props, prop_rules in by_properties.items():
+        names = {rule.selector[1:]: rule for rule in prop_rules}
+        # `justify-content-space-between` keeps the `justify-content-` prefix of its siblings
+        own = {name: name.rpartition("-")[0] + "-" if "-" in name else "" for name in names}
+        candidates = sorted({prefix for prefix in own.values() if prefix}, key=len)
+        by_prefix = {}
+        for name in names:
+            prefix = own[name] and next(p for p in candidates if name.startswith(p))
+            by_prefix.setdefault(prefix, []).append(name[len(prefix):])
+        for prefix, values in by_prefix.items():
+            for pattern, suffixes in fold_values(values):
+                # Prefixes with the same values share a line: `.{w|h}-{25|50|75|100|auto}`
+                key = pattern if prefix.endswith("-") else (prefix, pattern)
+                line = lines.setdefault(key, ([], pattern, [], suffixes, []))
+                line[0].append(prefix)
+                line[2].extend(props)
+                line[4].extend(names[prefix + suffix] for suffix in suffixes)
+
+    patterns = []
+    for prefixes, pattern, props, suffixes, line_rules in lines.values():
+        # One value per suffix, shared by every prefix on the line (`.{p|pt|...}-{0-6}`)
+        declared = {}
+        for rule in line_rules:
+            value = {normalize_value(value) for _, value in rule.declarations}
+            suffix = rule.selector[1:][len(next(p for p in prefixes if rule.selector[1:].startswith(p))):]
+            declared.setdefault(suffix, set()).update(value)
+        hint = None
+        if all(len(values) == 1 for values in declared.values()):
+            hint = value_hint(suffixes, [declared[suffix].pop() for suffix in suffixes])
+        if max(len(rule.declarations) for rule in line_rules) > GUIDE_MAX_PROPERTIES:
+            props = []
+        patterns.append((prefixes, pattern, props, hint))
+    return patterns
+
+def render_pattern(prefixes, pattern, props, hint=None):
+    prefixes = list(dict.fromkeys(prefixes))
+    if len(prefixes) == 1:
+        text = f"`.{prefixes[0]}{pattern}`"
+    else:
+        text = "`.{" + "|".join(prefix[:-1] for prefix in prefixes) + "}-" + pattern + "`"
+        # Merged lines name the property families instead: (padding, margin)
+        props = [property_family(prop) for prop in props]
+    notes = ", ".join(dict.fromkeys(props))
+    if hint:
+        notes = f"{notes}: {hint}" if notes else hint
+    return f"{text} ({notes})" if notes else text
+
+def spacing_sides():
+    # "`t` top, ..., `x` left+right" from SPACING_DIRECTIONS
+    sides = []
+    for code, props in SPACING_DIRECTIONS.items():
+        if code:
+            edges = [prop.split("-", 1)[1] for prop in props if prop.startswith("padding")]
+            sides.append(f"`{code}` {'+'.join(edges)}")
+    return "- Sides: " + ", ".join(sides) + ", none for all sides"
+
+# Extra lines under a section heading of the guide
+GUIDE_SECTION_NOTES = {"spacing": spacing_sides}
+
+def render_style_guide(registry):
+    # -> (markdown, {section: tokens})
+    sections = {}
+    for rule in registry:
+        sections.setdefault(rule.section, []).append(rule)
+
+    if IMPORTANT_PREFIXES is None:
+        suffix = ["- **Suffix:** Add `-imp` to any class to apply `!important`."]
+    elif IMPORTANT_PREFIXES:
+        prefixes = ", ".join(f"`{prefix}`" for prefix in IMPORTANT_PREFIXES)
+        suffix = [f"- **Suffix:** Add `-imp` to classes starting with {prefixes} to apply `!important`."]
+    else:
+        suffix = []
+    if CASCADE_LAYER:
+        suffix.append(f"- **Layer:** Utilities are in `@layer {CASCADE_LAYER}`, any unlayered CSS overrides them.")
+    header = "\n".join([
+        "# CSS Utility Classes",
+        "",
+        "This file is auto-generated. Do not edit manually.",
+        "",
+        "## Features",
+        "- **Patterns:** `{a|b}` one of, `{0-6}` range, `step N` increment.",
+        *suffix,
+        "- **Variants:** `{" + "|".join(BREAKPOINTS) + "}:` min-width " + "/".join(BREAKPOINTS.values())
+        + ", `{" + "|".join(STATES) + "}:` states, e.g. `md:hover:p-3`.",
+        "",
+    ])
+    parts = [header]
+    tokens = {}
+    for name, rules in sections.items():
+        lines = [f"## {name.replace('_', ' ').title()}"]
+        if name in GUIDE_SECTION_NOTES:
+            lines.append(GUIDE_SECTION_NOTES[name]())
+        lines += [f"- {render_pattern(*line)}" for line in section_patterns(rules)]
+        text = "\n".join(lines) + "\n"
+        tokens[name] = count_tokens(text)
+        parts.append(text)
+    return "\n".join(parts), tokens
+
+def class_index(registry):
+    # Class name -> minified declarations, the same values the stylesheet ships
+    return {
+        rule.class_name(): ";".join(f"{prop}:{normalize_value(value)}" for prop, value in rule.declarations)
+        for rule in registry
+    }
+
+def write_docs(registry, digests):
+    guide, tokens = render_style_guide(registry)
+    if write_if_changed(OUTPUT_DOCS_PATH, guide.encode(), digests):
+        method = "tiktoken" if tiktoken is not None else "estimated"
+        counts = ", ".join(f"{name} {count}" for name, count in tokens.items())
+        print(f"Generated documentation at {OUTPUT_DOCS_PATH} ({count_tokens(guide)} tokens, {method}: {counts})")
+    index = json.dumps(class_index(registry), separators=(",", ":"))
+    if write_if_changed(OUTPUT_INDEX_PATH, index.encode(), digests):
+        print(f"Generated class index at {OUTPUT_INDEX_PATH}")
+
+def apply_output_options(module, args):
+    # --imp / --imp-allow -> IMPORTANT_PREFIXES and CASCADE_LAYER, --reorder -> COMPRESSION_ORDER
+    strategy, prefixes = args.imp, args.imp_allow
+    if strategy is None:
+        strategy = "allow" if prefixes else "all"
+    module.IMPORTANT_PREFIXES = None if strategy == "all" else prefixes if strategy in ("allow", "layer") else []
+    module.CASCADE_LAYER = "utilities" if strategy == "layer" else None
+    module.COMPRESSION_ORDER = args.reorder
+
+def load_fresh_module():
+    spec = importlib.util.spec_from_file_location("generate_watch", os.path.abspath(__file__))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def watch(args):
+    module = sys.modules[__name__]
+    source_path = os.path.abspath(__file__)
+    source_stamp = file_stamp(source_path)
+    cache = {}
+    catalogue_cache = {}
+    digests = {}
+    content_stamps = {}
+    content_tokens = {}
+    print(f"Watching for changes every {args.interval}s (Ctrl+C to stop)...")
+
+    variables = None
+    if args.inline_vars:
+        variables, _ = load_custom_properties(args.inline_vars, args.keep_vars)
+
+    first = True
+    while True:
+        changed = first
+        stamp = file_stamp(source_path)
+        if stamp != source_stamp:
+            source_stamp = stamp
+            try:
+                module = load_fresh_module()
+                apply_output_options(module, args)
+                changed = True
+            except Exception as e:
+                print(f"Keeping previous tables, failed to reload {source_path}: {e}")
+
+        used = None
+        if args.content:
+            stamps = {path: file_stamp(path) for path in expand_content_globs(args.content)}
+            dirty = [path for path, stamp in stamps.items() if content_stamps.get(path) != stamp]
+            removed = content_stamps.keys() - stamps.keys()
+            for path, tokens in zip(dirty, scan_files(dirty, args.jobs)):
+                content_tokens[path] = tokens
+            for path in removed:
+                del content_tokens[path]
+            content_stamps = stamps
+            changed = changed or bool(dirty or removed)
+            used = set().union(*content_tokens.values())
+
+        if changed:
+            started = time.perf_counter()
+            catalogue = None
+            if used is not None:
+                # Before the purged build, which leaves px_values narrowed
+                catalogue, _ = collect_rules(module, cache=catalogue_cache)
+            registry, rebuilt = collect_rules(module, used, cache, args.variants)
+            if variables:
+                registry, _ = inline_registry(registry, variables)
+                if catalogue is not None:
+                    catalogue, _ = inline_registry(catalogue, variables)
+            write_outputs(registry, used, digests, args, catalogue=catalogue)
+            write_docs(registry if catalogue is None else catalogue, digests)
+            print(f"Rebuilt {rebuilt} of {len(cache)} sections in {(time.perf_counter() - started) * 1000:.0f}ms")
+        first = False
+        time.sleep(args.interval)
+
+# Direction targets: the rule table is generated once (LTR) and mirrored or made logical
+DIRECTION_TARGETS = ["rtl", "logical"]
+RTL_SIDES = {"left": "right", "right": "left"}
+LOGICAL_SIDES = {"left": "inline-start", "right": "inline-end"}
+# Properties whose keyword values name a side (`object-position: top left`)
+SIDE_VALUE_PROPERTIES = {"object-position", "float", "clear", "text-align"}
+# Logical values exist for these only, object-position keeps its physical keywords
+LOGICAL_VALUES = {
+    "float": {"left": "inline-start", "right": "inline-end"},
+    "clear": {"left": "inline-start", "right": "inline-end"},
+    "text-align": {"left": "start", "right": "end"},
+}
+
+def direction_property(prop, target):
+    if target == "logical" and prop in LOGICAL_SIDES:
+        # left -> inset-inline-start
+        return "inset-" + LOGICAL_SIDES[prop]
+    sides = RTL_SIDES if target == "rtl" else LOGICAL_SIDES
+    return "-".join(sides.get(part, part) for part in prop.split("-"))
+
+def direction_value(prop, value, target):
+    if prop not in SIDE_VALUE_PROPERTIES:
+        return value
+    if target == "rtl":
+        return " ".join(RTL_SIDES.get(word, word) for word in value.split(" "))
+    return LOGICAL_VALUES.get(prop, {}).get(value, value)
+
+def direction_rules(rules, target):
+    # -> rules for `target`, rules without anything horizontal are reused as they are
+    converted = []
+    for rule in rules:
+        declarations = {
+            direction_property(prop, target): direction_value(prop, value, target)
+            for prop, value in rule.declarations
+        }
+        if target == "logical":
+            # padding-inline-start + padding-inline-end with one value -> padding-inline
+            for prop in [prop for prop in declarations if prop.endswith("-inline-start")]:
+                end = prop[:-len("start")] + "end"
+                if declarations.get(end) == declarations[prop]:
+                    declarations = {
+                        (prop[:-len("-start")] if key == prop else key): value
+                        for key, value in declarations.items() if key != end
+                    }
+        if tuple(declarations.items()) != rule.declarations:
+            rule = Rule(rule.selector, declarations, rule.section)
+        converted.append(rule)
+    return converted
+
+def write_direction_outputs(registry, used, digests, args, rename=None):
+    root, ext = os.path.splitext(OUTPUT_CSS_PATH)
+    manifest = {}
+    for target in args.directions:
+        path = f"{root}.{target}{ext}"
+        css, count = render_stylesheet(RuleRegistry(direction_rules(registry, target)), used, args.variants, rename)
+        written, _, entry = write_asset(path, css.encode(), args.compress, digests, args.content_hash)
+        manifest[os.path.basename(path)] = entry
+        print(f"Wrote {count} {target} rules into {written}")
+        if args.content_hash:
+            prune_hashed_assets(path, written, args.keep)
+    if args.content_hash:
+        update_manifest(os.path.dirname(OUTPUT_CSS_PATH), manifest, digests)
+
+# Static theme compilation: custom properties from a theme's :root block become literals
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+CSS_BRACE_RE = re.compile(r"[{}]")
+CUSTOM_PROPERTY_RE = re.compile(r"--([\w-]+)\s*:\s*([^;]+)")
+VAR_NAME_RE = re.compile(r"var\(\s*--([\w-]+)")
+ROOT_SELECTORS = {":root", "html"}
+# Deeper var() chains (or cycles) are left as references
+INLINE_MAX_DEPTH = 10
+
+def css_blocks(text):
+    # -> [(selector, own declarations, nested)] for every block. nested is True inside @media,
+    # @supports, @layer or another rule, where the values only apply sometimes
+    blocks = []
+    open_blocks = []
+    start = 0
+    for match in CSS_BRACE_RE.finditer(text):
+        if match.group() == "{":
+            # Declarations before a nested rule end with `;`, the selector is what follows
+            declarations, _, selector = text[start:match.start()].rpartition(";")
+            if open_blocks:
+                open_blocks[-1][1].append(declarations)
+            open_blocks.append((selector.strip(), []))
+        elif open_blocks:
+            selector, parts = open_blocks.pop()
+            parts.append(text[start:match.start()])
+            blocks.append((selector, ";".join(parts), bool(open_blocks)))
+        start = match.end()
+    return blocks
+
+def load_custom_properties(path, keep=()):
+    # -> ({name: value} to inline, runtime-switchable names). Switchable are the names matching
+    # a keep pattern and every variable another selector or an at-rule redefines (e.g.
+    # body.dark-mode, or :root inside @media (prefers-color-scheme: dark))
+    with open(path) as f:
+        text = CSS_COMMENT_RE.sub("", f.read())
+    root = {}
+    switchable = set()
+    for selector, body, nested in css_blocks(text):
+        values = {name: " ".join(value.split()) for name, value in CUSTOM_PROPERTY_RE.findall(body)}
+        if selector in ROOT_SELECTORS and not nested:
+            root.update(values)
+        else:
+            switchable.update(values)
+    patterns = [pattern.lstrip("-") for pattern in keep]
+    switchable.update(name for name in root if any(fnmatch.fnmatch(name, pattern) for pattern in patterns))
+    # A variable built from a switchable one is computed on :root, so descendants never see
+    # the switched value through it; inlining would change that, so it stays a reference too
+    changed = True
+    while changed:
+        changed = False
+        for name, value in root.items():
+            if name not in switchable and switchable.intersection(VAR_NAME_RE.findall(value)):
+                switchable.add(name)
+                changed = True
+    return {name: value for name, value in root.items() if name not in switchable}, switchable
+
+def inline_value(value, variables, depth=0):
+    # Replaces var(--name) and var(--name, fallback) for known names, anything else is kept
+    parts = []
+    index = 0
+    while True:
+        start = value.find("var(", index)
+        if start < 0:
+            break
+        nesting = 0
+        for end in range(start + 3, len(value)):
+            if value[end] == "(":
+                nesting += 1
+            elif value[end] == ")":
+                nesting -= 1
+                if nesting == 0:
+                    break
+        name = value[start + 4:end].split(",", 1)[0].strip()[2:]
+        parts.append(value[index:start])
+        if name in variables and depth < INLINE_MAX_DEPTH:
+            parts.append(inline_value(variables[name], variables, depth + 1))
+        else:
+            parts.append(value[start:end + 1])
+        index = end + 1
+    parts.append(value[index:])
+    return "".join(parts)
+
+def inline_rules(rules, variables):
+    # -> new rule list, rules without an inlinable var() are reused as they are
+    inlined = []
+    for rule in rules:
+        declarations = {prop: inline_value(value, variables) for prop, value in rule.declarations}
+        if tuple(declarations.items()) != rule.declarations:
+            rule = Rule(rule.selector, declarations, rule.section)
+        inlined.append(rule)
+    return inlined
+
+def inline_registry(registry, variables):
+    inlined = inline_rules(registry, variables)
+    changed = sum(new is not old for new, old in zip(inlined, registry))
+    return RuleRegistry(inlined), changed
+
+# Library API
+@dataclass
+class BuildConfig:
+    content: str = None  # comma separated globs to purge against, like --content
+    used: set = None  # class names to purge against, instead of scanning content
+    variants: list = field(default_factory=list)
+    encodings: list = field(default_factory=lambda: list(COMPRESSORS))
+    tables: dict = field(default_factory=dict)  # e.g. {"COLORS": [...], "SPACING_LEVELS": {...}}
+    inline_vars: str = None  # theme CSS whose :root custom properties are inlined, like --inline-vars
+    keep_vars: list = field(default_factory=list)
+    jobs: int = None
+
+@dataclass
+class BuildResult:
+    css: bytes
+    compressed: dict  # encoding -> bytes
+    docs: str
+    rules: int
+    registry: RuleRegistry = field(repr=False)
+
+    @property
+    def digest(self):
+        return hashlib.sha256(self.css).hexdigest()
+
+def apply_tables(module, tables):
+    for name, value in tables.items():
+        if not hasattr(module, name) or name != name.upper():
+            raise ValueError(f"Unknown table {name}")
+        setattr(module, name, value)
+    # Tables derived at import time
+    module.SPACING_PX_PATTERNS = module.spacing_px_patterns()
+    module.PX_PATTERNS = {**module.SPACING_PX_PATTERNS, **module.SIZING_PX_PATTERNS}
+
+def build(config=None):
+    # Pure build: nothing is written and no state of this module changes, because
+    # the generators run in a private copy of it. Safe to call repeatedly.
+    config = config or BuildConfig()
+    module = load_fresh_module()
+    apply_tables(module, config.tables)
+
+    used = config.used
+    if used is None and config.content:
+        used = scan_content(expand_content_globs(config.content), config.jobs)
+    # The docs describe the full rule set, not just the classes the content uses
+    catalogue = None
+    if used is not None:
+        catalogue, _ = module.collect_rules(module)
+    registry, _ = module.collect_rules(module, used, variants=config.variants)
+    if config.inline_vars:
+        variables, _ = load_custom_properties(config.inline_vars, config.keep_vars)
+        registry, _ = module.inline_registry(registry, variables)
+        if catalogue is not None:
+            catalogue, _ = module.inline_registry(catalogue, variables)
+    css, count = module.render_stylesheet(registry, used, config.variants)
+    data = css.encode()
+    return BuildResult(
+        css=data,
+        compressed=compress_variants(data, config.encodings),
+        docs=module.render_style_guide(registry if catalogue is None else catalogue)[0],
+        rules=count,
+        registry=registry,
+    )
+
+# Multi-theme builds
+def load_theme(path):
+    # {"name": "brand-a", "COLORS": [...], "SPACING_LEVELS": {...}, "RADIUS_SCALE": {...}}
+    with open(path) as f:
+        data = json.load(f)
+    name = data.get("name") or os.path.splitext(os.path.basename(path))[0]
+    tables = {key: value for key, value in data.items() if key.isupper()}
+    return re.sub(r"[^\w-]", "-", name), tables
+
+def themed_sections(module, themes):
+    # Sections whose fingerprint changes under at least one theme's tables
+    base = {section_name(generate): section_fingerprint(module, generate) for generate in module.GENERATORS}
+    sections = set()
+    for _, tables in themes:
+        themed = load_fresh_module()
+        apply_tables(themed, tables)
+        themed.px_values = module.px_values
+        for generate in themed.GENERATORS:
+            if section_fingerprint(themed, generate) != base[section_name(generate)]:
+                sections.add(section_name(generate))
+    return sections
+
+def generate_theme_sections(job):
+    # Process pool worker; returns plain tuples because the private module's Rule class
+    # can't be pickled across processes
+    tables, sections, px = job
+    module = load_fresh_module()
+    apply_tables(module, tables)
+    module.px_values = px
+    rules = []
+    for generate in module.GENERATORS:
+        if section_name(generate) in sections:
+            rules.extend((rule.selector, rule.declarations, rule.section) for rule in run_section(module, generate))
+    return rules
+
+def split_themes(registry, themed, sections):
+    # -> (base rules, [delta rules per theme]). The base holds every rule of the sections no
+    # theme changes plus themed rules that come out identical in all themes, in generator
+    # order. A delta holds its theme's other rules and, as in split_chunks(), repeats every
+    # later base rule that shares a property family with one of them (or with a repeated
+    # one), so base + delta keeps the cascade of that theme's single stylesheet
+    common = set.intersection(*({(rule.selector, rule.declarations) for rule in rules} for rules in themed))
+    order = [section_name(generate) for generate in GENERATORS]
+
+    def theme_order(rules):
+        return [rule for name in order for rule in (rules if name in sections else registry) if rule.section == name]
+
+    def shared(rule):
+        return rule.section not in sections or (rule.selector, rule.declarations) in common
+
+    base = [rule for rule in theme_order(themed[0]) if shared(rule)]
+    deltas = []
+    for rules in themed:
+        delta = []
+        started = set()
+        for rule in theme_order(rules):
+            families = {property_family(prop) for prop, _ in rule.declarations}
+            # A repeated rule moves behind the base too, so its families count from then on
+            if not shared(rule) or not started.isdisjoint(families):
+                started.update(families)
+                delta.append(rule)
+        deltas.append(delta)
+    return base, deltas
+
+def generate_themes(module, patterns, jobs=None, variables=None):
+    # -> ([(theme name, rules of its themed sections)], themed section names)
+    themes = [load_theme(path) for path in expand_content_globs(patterns)]
+    if not themes:
+        return [], set()
+    sections = themed_sections(module, themes)
+    job_list = [(tables, sections, list(module.px_values)) for _, tables in themes]
+    workers = min(len(job_list), jobs or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(generate_theme_sections, job_list))
+    themed = [[Rule(selector, dict(declarations), section) for selector, declarations, section in rules] for rules in results]
+    if variables:
+        themed = [inline_rules(rules, variables) for rules in themed]
+    return [(name, rules) for (name, _), rules in zip(themes, themed)], sections
+
+def write_theme_outputs(registry, themes, sections, used, digests, args, rename=None):
+    if not themes:
+        print(f"No theme files match {args.themes}")
+        return
+    base, deltas = split_themes(registry, [rules for _, rules in themes], sections)
+
+    root, ext = os.path.splitext(OUTPUT_CSS_PATH)
+    outputs = [(f"{root}.base{ext}", base)]
+    outputs += [(f"{root}.theme-{name}{ext}", rules) for (name, _), rules in zip(themes, deltas)]
+    manifest = {}
+    for path, rules in outputs:
+        css, count = render_stylesheet(RuleRegistry(rules), used, args.variants, rename)
+        written, _, entry = write_asset(path, css.encode(), args.compress, digests, args.content_hash)
+        manifest[os.path.basename(path)] = entry
+        print(f"Wrote {count} rules into {written}")
+        if args.content_hash:
+            prune_hashed_assets(path, written, args.keep)
+    print(f"Built {len(themes)} themes, themed sections: {', '.join(sorted(sections)) or 'none'}")
+    if args.content_hash:
+        update_manifest(os.path.dirname(OUTPUT_CSS_PATH), manifest, digests)
+
+def comma_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def share_list(value):
+    # "0.5,0.1" -> [0.5, 0.1], highest share first
+    try:
+        shares = sorted({float(item) for item in comma_list(value)}, reverse=True)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shares {value!r}")
+    if not shares or not all(0 < share <= 1 for share in shares):
+        raise argparse.ArgumentTypeError("Shares must be between 0 and 1")
+    return shares
+
+def encoding_list(value):
+    encodings = comma_list(value)
+    unknown = [encoding for encoding in encodings if encoding not in COMPRESSORS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown encoding(s): {', '.join(unknown)}")
+    return encodings
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate CSS utility classes and their style guide.")
+    parser.add_argument("--content", help='Comma separated globs of source files to scan, e.g. "templates/**/*.html,src/**/*.jsx". Only classes found there are written.')
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for scanning (default: CPU count)")
+    parser.add_argument("--variants", type=comma_list, default=[], help='Comma separated variant classes to generate, e.g. "md:d-flex,hover:text-primary" (with --content they are also picked up from the templates)')
+    parser.add_argument("--compress", type=encoding_list, default=list(COMPRESSORS), help="Comma separated precompressed variants to write (default: br,gz,zst, empty for none)")
+    parser.add_argument("--stream", action="store_true", help="Write the CSS and its compressed variants chunk by chunk while it is serialized, instead of building the whole stylesheet in memory first")
+    parser.add_argument("--reorder", action="store_true", help="Reorder rules so similar ones sit together (only rules on unrelated properties move, so the cascade is unchanged) and report .br/.gz sizes against the default order")
+    parser.add_argument("--hash", dest="content_hash", action="store_true", help=f"Write generated.<contenthash>.css (plus variants) and record it in {MANIFEST_NAME}")
+    parser.add_argument("--keep", type=int, default=3, help="Hashed builds to keep when --hash prunes old files (default: 3)")
+    parser.add_argument("--critical", metavar="PAGES_DIR", help="Directory of rendered HTML pages to extract per-route critical CSS from")
+    parser.add_argument("--critical-out", help="Where to write <route>.css and <route>.head.html (default: critical/ next to the CSS)")
+    parser.add_argument("--critical-href", help="URL of the full stylesheet in the deferred <link> (default: /static/css/<css file name>)")
+    parser.add_argument("--mangle", action="store_true", help="Production mode: replace class names with short tokens (most used first) and write the mapping to --mangle-map")
+    parser.add_argument("--mangle-map", default=OUTPUT_CLASS_MAP_PATH, help="Class name -> token JSON; existing assignments are kept so tokens stay stable between builds")
+    parser.add_argument("--rewrite", help="With --mangle: comma separated globs of templates whose class attributes are rewritten with the mapping")
+    parser.add_argument("--rewrite-out", help="Directory the rewritten templates are written to")
+    parser.add_argument("--stats", nargs="?", const=OUTPUT_STATS_PATH, help=f"Print per-section rule/declaration/byte counts and timings and write them as JSON (default: {os.path.basename(OUTPUT_STATS_PATH)} next to the CSS)")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[], help='Size budget such as "total.br=20k", "spacing.gz=8000" or "spacing.imp.raw=50k"; the build exits 1 when one is exceeded (repeatable)')
+    parser.add_argument("--split", type=share_list, metavar="SHARES", help='With --content: also write generated.core.css with the classes found in at least this share of the scanned files, plus extended chunks for the rest, e.g. "0.5" or "0.5,0.1" for two extended chunks; all are listed in the manifest')
+    parser.add_argument("--imp", choices=IMPORTANT_STRATEGIES, help="-imp classes: all (default), allow (only --imp-allow prefixes), layer (normal utilities in @layer utilities so unlayered CSS overrides them without !important, -imp only for --imp-allow prefixes) or none")
+    parser.add_argument("--imp-allow", type=comma_list, default=[], metavar="PREFIXES", help='Comma separated class prefixes that keep -imp variants, e.g. "d-,text-,p-3"')
+    parser.add_argument("--usage-index", nargs="?", const=OUTPUT_USAGE_INDEX_PATH, metavar="PATH", help=f"With --content: keep a persistent per-file class index (default: {os.path.basename(OUTPUT_USAGE_INDEX_PATH)} next to this script) and only rescan files whose mtime and content hash changed")
+    parser.add_argument("--usage-report", nargs="?", const=OUTPUT_USAGE_REPORT_PATH, metavar="PATH", help=f"With --content: print used/unused utilities per section and the templates using the most, and write them as JSON (default: {os.path.basename(OUTPUT_USAGE_REPORT_PATH)} next to the CSS)")
+    parser.add_argument("--inline-vars", metavar="THEME_CSS", help="Inline the custom properties of this stylesheet's :root block as literal values; variables another selector or an at-rule such as @media redefines (e.g. body.dark-mode) stay var() references")
+    parser.add_argument("--keep-vars", type=comma_list, default=[], metavar="PATTERNS", help='Comma separated variable name patterns that are runtime-switchable and never inlined, e.g. "color-*,accent"')
+    parser.add_argument("--directions", type=comma_list, default=[], help="Comma separated extra direction targets built from the same rules: rtl (generated.rtl.css, left and right mirrored) and logical (generated.logical.css, padding-inline-start and so on)")
+    parser.add_argument("--themes", help="Comma separated globs of theme JSON files (table overrides such as COLORS, SPACING_LEVELS, RADIUS_SCALE); writes a shared generated.base.css plus one generated.theme-<name>.css delta per theme")
+    parser.add_argument("--watch", action="store_true", help="Keep running and rebuild only the sections affected by edits to this file or the --content files")
+    parser.add_argument("--interval", type=float, default=0.5, help="Polling interval in seconds for --watch")
+    args = parser.parse_args(argv)
+    if args.rewrite and not (args.mangle and args.rewrite_out):
+        parser.error("--rewrite needs --mangle and --rewrite-out")
+    if args.split and not args.content:
+        parser.error("--split needs --content to count class usage")
+    if (args.usage_index or args.usage_report) and not args.content:
+        parser.error("--usage-index and --usage-report need --content")
+    unknown = [target for target in args.directions if target not in DIRECTION_TARGETS]
+    if unknown:
+        parser.error(f"Unknown direction target {unknown[0]}, choose from {', '.join(DIRECTION_TARGETS)}")
+    if args.imp == "allow" and not args.imp_allow:
+        parser.error("--imp allow needs --imp-allow")
+    sections = [section_name(fn) for fn in GENERATORS]
+    scopes = {"total"} | {section + half for section in sections for half in ("", ".normal", ".imp")}
+    unknown = [f"{scope}.{metric}" for scope, metric, _ in args.budget if scope not in scopes]
+    if unknown:
+        parser.error(f"Unknown budget scope in {unknown[0]}, expected total, <section>, <section>.normal or <section>.imp with a section from {', '.join(sections)}")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    apply_output_options(sys.modules[__name__], args)
+    if args.watch:
+        try:
+            watch(args)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    print("Generating CSS...")
+
+    used = None
+    frequency = Counter()
+    paths = []
+    if args.content:
+        paths = expand_content_globs(args.content)
+        if args.usage_index:
+            per_file = update_usage_index(paths, args.usage_index, args.jobs)
+        else:
+            per_file = scan_files(paths, args.jobs)
+        used = set().union(*per_file)
+        # Number of files each class appears in
+        frequency = Counter(token for tokens in per_file for token in tokens)
+        print(f"Scanned {len(paths)} files")
+
+    digests = {}
+    timings = {}
+    catalogue = None
+    if used is not None:
+        # The full rule set for the kept count, the usage report and the docs, collected
+        # first because the purged build leaves the pixel utilities narrowed
+        catalogue, _ = collect_rules(sys.modules[__name__])
+    if args.usage_report:
+        report = usage_report(catalogue, paths, per_file)
+        print_usage_report(report)
+        write_if_changed(args.usage_report, (json.dumps(report, indent=2) + "\n").encode(), digests)
+        print(f"Wrote usage report to {args.usage_report}")
+    registry, _ = collect_rules(sys.modules[__name__], used, variants=args.variants, timings=timings)
+    variables = None
+    if args.inline_vars:
+        variables, switchable = load_custom_properties(args.inline_vars, args.keep_vars)
+        registry, changed = inline_registry(registry, variables)
+        print(f"Inlined {len(variables)} custom properties into {changed} rules, kept {len(switchable)} runtime-switchable ones as var()")
+        if catalogue is not None:
+            catalogue, _ = inline_registry(catalogue, variables)
+    if catalogue is None:
+        catalogue = registry
+    themes, themed = [], set()
+    if args.themes:
+        # Before the main outputs, so a mangled class map also covers classes only a theme has
+        themes, themed = generate_themes(sys.modules[__name__], args.themes, args.jobs, variables)
+    css_path, rename = write_outputs(registry, used, digests, args, frequency, catalogue, themes)
+    write_docs(catalogue, digests)
+
+    if args.directions:
+        write_direction_outputs(registry, used, digests, args, rename)
+
+    if args.reorder:
+        print_order_report(registry, used, args.variants, list(dict.fromkeys(["br", "gz"] + args.compress)), rename)
+
+    if args.split:
+        write_chunks(registry, used, digests, args, frequency, len(paths), rename)
+
+    if args.themes:
+        write_theme_outputs(registry, themes, themed, used, digests, args, rename)
+
+    failed = False
+    if args.stats or args.budget:
+        # Budgets on an encoding that is not written still get measured
+        encodings = list(dict.fromkeys(args.compress + [metric for _, metric, _ in args.budget if metric in COMPRESSORS]))
+        report = build_stats(registry, used, args.variants, encodings, timings, rename)
+        report["budgets"] = check_budgets(report, args.budget)
+        print_stats(report, [encoding for encoding in encodings if encoding in report["total"]])
+        if args.stats:
+            write_if_changed(args.stats, (json.dumps(report, indent=2) + "\n").encode(), digests)
+            print(f"Wrote build stats to {args.stats}")
+        failed = not all(result["ok"] for result in report["budgets"])
+
+    if args.rewrite:
+        rewrite_templates(expand_content_globs(args.rewrite), args.rewrite_out, rename, args.jobs)
+
+    if args.critical:
+        out_dir = args.critical_out or os.path.join(os.path.dirname(OUTPUT_CSS_PATH), "critical")
+        href = args.critical_href or "/static/css/" + os.path.basename(css_path)
+        available = set(stylesheet_class_names(registry, used, args.variants))
+        write_critical(registry, available, args.critical, out_dir, href, args.jobs, digests, rename)
+
+    if failed:
+        print("Build failed: size budget exceeded")
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,164 @@
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import generate
+
+TAG_RE = re.compile(r"<[a-zA-Z][^<>]*>")
+STYLE_ATTR_RE = re.compile(r"""\sstyle\s*=\s*(["'])(.*?)\1""", re.S)
+
+# Class name -> (cascade position, declarations, is_important), see build_style_map()
+style_map = None
+# Pixel prefix -> (index of the last rule of its pixel block, position in its pattern table)
+px_positions = None
+
+def build_style_map(variables=None):
+    # -> (style map, pixel positions). Positions follow the stylesheet: every normal rule in
+    # registry order, then the -imp half
+    registry, _ = generate.collect_rules(generate)
+    if variables:
+        registry, _ = generate.inline_registry(registry, variables)
+    styles = {}
+    index_of = {}
+    for is_important in (False, True):
+        for index, rule in enumerate(registry):
+            index_of[rule.selector] = index
+            if is_important and not generate.important_allowed(rule.class_name()):
+                continue
+            declarations = tuple((prop, generate.normalize_value(value)) for prop, value in rule.declarations)
+            styles[rule.class_name(is_important)] = ((is_important, index, 0, 0), declarations, is_important)
+    positions = {}
+    for patterns in (generate.SPACING_PX_PATTERNS, generate.SIZING_PX_PATTERNS):
+        last = index_of[f".{list(patterns)[-1]}-{generate.PX_RANGE[-1]}px"]
+        for order, prefix in enumerate(patterns):
+            positions[prefix] = (last, order)
+    return styles, positions
+
+def init_inliner(styles, positions):
+    # Runs once per worker process so the maps are not pickled for every document
+    global style_map, px_positions
+    style_map = styles
+    px_positions = positions
+
+def lookup(name):
+    style = style_map.get(name)
+    if style is not None:
+        return style
+    # Pixel values outside the enumerated range come right after their pixel block, by value
+    # and then prefix, the order add_px_rule() is called in
+    resolved = generate.resolve_px_class(name)
+    if resolved is None:
+        return None
+    properties, is_important = resolved
+    if is_important and not generate.important_allowed(name[:-len("-imp")]):
+        return None
+    prefix, px = generate.PX_CLASS_RE.fullmatch(name).group(1, 2)
+    last, order = px_positions[prefix]
+    return (is_important, last, int(px), order), tuple(properties.items()), is_important
+
+def parse_style(text):
+    declarations = []
+    for declaration in text.split(";"):
+        prop, _, value = declaration.partition(":")
+        if prop.strip() and value.strip():
+            value = value.strip()
+            is_important = value.lower().endswith("!important")
+            if is_important:
+                value = value[:-len("!important")].rstrip()
+            declarations.append((prop.strip().lower(), value, is_important))
+    return declarations
+
+def merge_declarations(declarations):
+    # Later declarations win unless the earlier one is !important and they are not; the
+    # winner moves to the end so shorthands and longhands keep their relative order
+    merged = {}
+    for prop, value, is_important in declarations:
+        previous = merged.get(prop)
+        if previous is None or is_important or not previous[1]:
+            merged.pop(prop, None)
+            merged[prop] = (value, is_important)
+    return ";".join(f"{prop}:{value}" + ("!important" if is_important else "") for prop, (value, is_important) in merged.items())
+
+def inline_tag(match):
+    tag = match.group()
+    class_match = generate.CLASS_ATTR_RE.search(tag)
+    if class_match is None:
+        return tag
+    tokens = class_match.group(3).split()
+    styles = [(style, token) for token in tokens for style in [lookup(token)] if style is not None]
+    if not styles:
+        return tag
+    inlined = {token for _, token in styles}
+    styles.sort()
+
+    # Utilities in cascade order, then the element's own style attribute, which beats them
+    # unless they are !important
+    declarations = [(prop, value, is_important) for (_, rule, is_important), _ in styles for prop, value in rule]
+    style_match = STYLE_ATTR_RE.search(tag)
+    if style_match:
+        declarations += parse_style(style_match.group(2))
+        tag = tag[:style_match.start()] + tag[style_match.end():]
+        class_match = generate.CLASS_ATTR_RE.search(tag)
+    style = merge_declarations(declarations)
+    quote = "'" if '"' in style else '"'
+    style = style.replace(quote, "&quot;")
+
+    kept = [token for token in tokens if token not in inlined]
+    attributes = f'{class_match.group(1)}"{" ".join(kept)}" ' if kept else ""
+    attributes += f"style={quote}{style}{quote}"
+    return tag[:class_match.start()] + attributes + tag[class_match.end():]
+
+def inline_html(html):
+    # Needs init_inliner(*build_style_map()) first in this process
+    return TAG_RE.sub(inline_tag, html)
+
+def inline_file(job):
+    source, target = job
+    with open(source, encoding="utf-8") as f:
+        html = f.read()
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "w", encoding="utf-8") as f:
+        f.write(inline_html(html))
+    return len(html)
+
+def inline_documents(paths, out_dir, maps, jobs=None):
+    # Outputs keep their layout relative to the common root of `paths`; workers write them
+    # directly, so only byte counts come back
+    if not paths:
+        return 0
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    job_list = [(path, os.path.join(out_dir, os.path.relpath(os.path.abspath(path), root))) for path in paths]
+    workers = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(job_list) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_inliner, initargs=maps) as pool:
+        return sum(pool.map(inline_file, job_list, chunksize=chunksize))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replace utility classes in HTML documents (e.g. emails) with inline style attributes.")
+    parser.add_argument("content", help='Comma separated globs of HTML documents, or "-" to filter stdin to stdout')
+    parser.add_argument("--out", help="Directory the inlined documents are written to (required unless reading stdin)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--inline-vars", metavar="THEME_CSS", help="Resolve var() references with this theme's :root custom properties; most email clients do not support them")
+    parser.add_argument("--keep-vars", type=generate.comma_list, default=[], metavar="PATTERNS", help="Variable name patterns that stay var() references")
+    args = parser.parse_args(argv)
+    if args.content != "-" and not args.out:
+        parser.error("--out is required")
+
+    variables = None
+    if args.inline_vars:
+        variables, _ = generate.load_custom_properties(args.inline_vars, args.keep_vars)
+    maps = build_style_map(variables)
+
+    if args.content == "-":
+        init_inliner(*maps)
+        sys.stdout.write(inline_html(sys.stdin.read()))
+        return 0
+    paths = generate.expand_content_globs(args.content)
+    total = inline_documents(paths, args.out, maps, args.jobs)
+    print(f"Inlined {len(paths)} documents ({total:,} B) into {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
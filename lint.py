@@ -0,0 +1,103 @@
+import argparse
+import difflib
+import fnmatch
+import re
+import sys
+
+import generate
+
+# Class attribute tokens that are template expressions rather than class names
+PLAIN_TOKEN_RE = re.compile(r"[\w:-]+")
+SUGGESTION_CUTOFF = 0.6
+
+# Built once per process: every base class name, and the names grouped by their first
+# segment (`justify`, `pt`, ...), which is also how a token is recognized as a utility
+catalogue = None
+
+def load_catalogue():
+    global catalogue
+    if catalogue is None:
+        registry, _ = generate.collect_rules(generate)
+        by_prefix = {}
+        for rule in registry:
+            name = rule.class_name()
+            by_prefix.setdefault(name.split("-", 1)[0], []).append(name)
+        for prefix in generate.PX_PATTERNS:
+            by_prefix.setdefault(prefix, [])
+        catalogue = ({rule.class_name() for rule in registry}, by_prefix)
+    return catalogue
+
+def is_utility(name):
+    names, _ = load_catalogue()
+    if name.endswith("-imp") and generate.important_allowed(name[:-len("-imp")]):
+        name = name[:-len("-imp")]
+    return name in names or generate.resolve_px_class(name) is not None
+
+def suggest(name):
+    _, by_prefix = load_catalogue()
+    base = name[:-len("-imp")] if name.endswith("-imp") else name
+    candidates = by_prefix.get(base.split("-", 1)[0], [])
+    matches = difflib.get_close_matches(base, candidates, n=1, cutoff=SUGGESTION_CUTOFF)
+    if not matches:
+        return None
+    return matches[0] + name[len(base):]
+
+def check_token(token):
+    # -> problem description or None; tokens that do not look like utilities are skipped
+    _, by_prefix = load_catalogue()
+    if ":" in token:
+        parsed = generate.parse_variant(token)
+        name = token.rsplit(":", 1)[1]
+        if parsed is None:
+            if is_utility(name):
+                return f"unknown variant prefix in {token!r}, use {'/'.join(generate.BREAKPOINTS)} then {'/'.join(generate.STATES)}"
+            return None
+        prefix = token[:-len(name)]
+    else:
+        name, prefix = token, ""
+    if name.split("-", 1)[0] not in by_prefix or is_utility(name):
+        return None
+    match = suggest(name)
+    hint = f" (did you mean {prefix + match!r}?)" if match else ""
+    return f"unknown utility {token!r}{hint}"
+
+def lint_file(path):
+    # -> [(line, token, message)]
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    except OSError as e:
+        return [(0, None, f"cannot read: {e}")]
+    problems = []
+    for match in generate.CLASS_ATTR_RE.finditer(text):
+        line = text.count("\n", 0, match.start(3)) + 1
+        for token in match.group(3).split():
+            if not PLAIN_TOKEN_RE.fullmatch(token):
+                continue
+            message = check_token(token)
+            if message:
+                problems.append((line, token, message))
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag class names in templates that look like utilities but are not generated.")
+    parser.add_argument("content", help='Comma separated globs of templates, e.g. "templates/**/*.html,src/**/*.jsx"')
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--ignore", type=generate.comma_list, default=[], help='Comma separated patterns of project classes that share a utility prefix, e.g. "text-brand*,d-print"')
+    args = parser.parse_args(argv)
+
+    paths = generate.expand_content_globs(args.content)
+    # Loaded before the pool starts, so forked workers inherit it
+    load_catalogue()
+    count = 0
+    for path, problems in zip(paths, generate.process_map(lint_file, paths, args.jobs)):
+        for line, token, message in problems:
+            if token and any(fnmatch.fnmatch(token, pattern) for pattern in args.ignore):
+                continue
+            print(f"{path}:{line}: {message}")
+            count += 1
+    print(f"Checked {len(paths)} files, {count} problem{'s' if count != 1 else ''}")
+    return 1 if count else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import argparse
+import hashlib
+from wsgiref.simple_server import make_server
+
+import generate
+
+DEFAULT_PATH = "/static/css/generated.css"
+# Preferred order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ["br", "zst", "gz"]
+CONTENT_ENCODINGS = {"br": "br", "gz": "gzip", "zst": "zstd"}
+
+def parse_accept_encoding(header):
+    # "gzip;q=0.8, br" -> {"gzip": 0.8, "br": 1.0}
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+def negotiate(header, available):
+    # -> encoding key from `available` (e.g. "br") or None for identity
+    accepted = parse_accept_encoding(header or "")
+    best, best_quality = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        name = CONTENT_ENCODINGS[encoding]
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in tags or etag in tags or etag in [tag[2:] for tag in tags if tag.startswith("W/")]
+
+class CSSResponder:
+    # Precomputes body and headers per encoding, so a request is two dict lookups
+    def __init__(self, result, cache_control="no-cache"):
+        self.representations = {}
+        digest = hashlib.sha256(result.css).hexdigest()[:20]
+        bodies = {None: result.css, **result.compressed}
+        for encoding, body in bodies.items():
+            # Strong ETags must differ per representation
+            etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+            headers = [
+                ("Content-Type", "text/css; charset=utf-8"),
+                ("ETag", etag),
+                ("Vary", "Accept-Encoding"),
+                ("Cache-Control", cache_control),
+            ]
+            if encoding:
+                headers.append(("Content-Encoding", CONTENT_ENCODINGS[encoding]))
+            self.representations[encoding] = (etag, headers, body)
+
+    def respond(self, method, accept_encoding, if_none_match):
+        # -> (status, headers, body)
+        if method not in ("GET", "HEAD"):
+            return "405 Method Not Allowed", [("Allow", "GET, HEAD")], b""
+        encoding = negotiate(accept_encoding, self.representations)
+        etag, headers, body = self.representations[encoding]
+        if etag_matches(if_none_match, etag):
+            return "304 Not Modified", [h for h in headers if h[0] != "Content-Type"], b""
+        headers = headers + [("Content-Length", str(len(body)))]
+        return "200 OK", headers, b"" if method == "HEAD" else body
+
+class CSSMiddleware:
+    # WSGI: serves the generated stylesheet from memory at `path`, everything else goes to `app`
+    def __init__(self, app, result=None, config=None, path=DEFAULT_PATH, cache_control="no-cache"):
+        self.app = app
+        self.path = path
+        self.cache_control = cache_control
+        self.config = config
+        self.reload(result)
+
+    def reload(self, result=None):
+        # Rebuild (or swap in a prebuilt result) without restarting the server
+        self.responder = CSSResponder(result or generate.build(self.config), self.cache_control)
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") != self.path:
+            return self.app(environ, start_response)
+        status, headers, body = self.responder.respond(
+            environ.get("REQUEST_METHOD", "GET"),
+            environ.get("HTTP_ACCEPT_ENCODING"),
+            environ.get("HTTP_IF_NONE_MATCH"),
+        )
+        start_response(status, headers)
+        return [body]
+
+class ASGICSSMiddleware:
+    # ASGI version of CSSMiddleware
+    def __init__(self, app, result=None, config=None, path=DEFAULT_PATH, cache_control="no-cache"):
+        self.app = app
+        self.path = path
+        self.cache_control = cache_control
+        self.config = config
+        self.reload(result)
+
+    def reload(self, result=None):
+        self.responder = CSSResponder(result or generate.build(self.config), self.cache_control)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        request_headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        status, headers, body = self.responder.respond(
+            scope.get("method", "GET"),
+            request_headers.get("accept-encoding"),
+            request_headers.get("if-none-match"),
+        )
+        await send({
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+def not_found(environ, start_response):
+    start_response("404 Not Found", [("Content-Type", "text/plain")])
+    return [b"Not found\n"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the generated stylesheet from memory (dev/preview server).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--path", default=DEFAULT_PATH, help=f"URL path of the stylesheet (default: {DEFAULT_PATH})")
+    parser.add_argument("--content", help="Comma separated globs to purge against, like generate.py --content")
+    args = parser.parse_args(argv)
+
+    app = CSSMiddleware(not_found, config=generate.BuildConfig(content=args.content), path=args.path)
+    with make_server(args.host, args.port, app) as server:
+        print(f"Serving {args.path} on http://{args.host}:{args.port}")
+        server.serve_forever()
+
+if __name__ == "__main__":
+    main()